@@ -16,6 +16,7 @@ class BaseWaypoint:
     raw_csv_name = 'raw_frame.csv'
     velocity_csv_name = 'velocity_frame.csv'
     spline_csv_name = 'cubic_spline_frame.csv'
+    velocity_spline_name = 'velocity_spline.npz'  # subordinate stations keep their spline instead of a velocity frame
 
     code_types = {'H': 'Harmonic', 'S': 'Subordinate', 'W': 'Weak', 'L': 'Location', 'E': 'Empty', 'P': 'Pseudo'}
     code_symbols = {'H': 'Symbol-Pin-Green', 'S': 'Symbol-Pin-Green', 'W': 'Symbol-Pin-Yellow',
@@ -80,6 +81,7 @@ class BaseWaypoint:
         self.raw_csv_path = self.folder.joinpath(self.raw_csv_name)
         self.spline_csv_path = self.folder.joinpath(self.spline_csv_name)
         self.velocity_csv_path = self.folder.joinpath(self.velocity_csv_name)
+        self.velocity_spline_path = self.folder.joinpath(self.velocity_spline_name)
         makedirs(self.folder, exist_ok=True)
 
         self.folder.joinpath(self.type + ' ' +self.name.replace(',','').replace('"','') + '.info').touch()
@@ -0,0 +1,118 @@
+from time import perf_counter
+import sys
+import tracemalloc
+
+import numpy as np
+from sympy.geometry import Point3D, Line, Segment
+from sympy import symbols
+from scipy.interpolate import Rbf
+from pandas import Series
+
+from tt_interpolation.interpolation import Interpolator, InterpolationOperator, SplineCoefficients
+
+
+class SympyInterpolator:  # the original sympy geometry, kept for comparison
+
+    def set_interpolation_point(self, pt: Point3D):
+        self.input_point = pt.scale(Interpolator.scale, Interpolator.scale, 1)
+
+    def get_interpolated_point(self):
+        if self.shape == Interpolator.SURFACE:
+            self.output_point = Point3D(self.input_point.x, self.input_point.y, self.surface(self.input_point.x, self.input_point.y).tolist())
+        elif self.shape == Interpolator.LINE:
+            self.output_point = Line(self.linear_range).projection(self.input_point)
+        return self.output_point.scale(1/Interpolator.scale, 1/Interpolator.scale, 1)
+
+    def __init__(self, pts: tuple):
+        self.shape = Interpolator.LINE if len(pts) == 2 else Interpolator.SURFACE
+        scaled_point_list = [pt.scale(Interpolator.scale, Interpolator.scale, 1) for pt in pts]
+        closed_figure = scaled_point_list + [scaled_point_list[0]]
+        segments = [Segment(pt, closed_figure[index+1]) for index, pt in enumerate(closed_figure[:-1])]
+        self.linear_range = segments[0]
+        ss = np.array([s.length for s in segments]).min() / Interpolator.num_edge_points
+        t = symbols('t')
+        edge_pts = []
+        for segment in segments:
+            num_pts = range(1, int(round(segment.length / ss, 0)))
+            edge_pts += [segment.arbitrary_point(t).evalf(subs={t: pt*ss/segment.length}) for pt in num_pts]
+        edge_point_array = np.array(edge_pts).astype(float)
+        if self.shape == Interpolator.SURFACE:
+            self.surface = Rbf(edge_point_array[:, 0], edge_point_array[:, 1], edge_point_array[:, 2], function='thin_plate', smooth=100.0)
+
+
+# stations a few hundredths of a degree around a waypoint, with velocities in knots
+def random_case(rng, num_points: int):
+    stations = np.column_stack([41.5 + rng.uniform(-0.05, 0.05, num_points), -71.3 + rng.uniform(-0.05, 0.05, num_points), rng.uniform(-3, 3, num_points)])
+    waypoint = np.array([41.5 + rng.uniform(-0.02, 0.02), -71.3 + rng.uniform(-0.02, 0.02), 0.0])
+    return stations, waypoint
+
+
+def sympy_velocity(stations, waypoint):
+    interpolator = SympyInterpolator(tuple(Point3D(*pt) for pt in stations))
+    interpolator.set_interpolation_point(Point3D(*waypoint))
+    return float(interpolator.get_interpolated_point().z.evalf())
+
+
+def numpy_velocity(stations, waypoint):
+    interpolator = Interpolator(stations)
+    interpolator.set_interpolation_point(waypoint)
+    return float(interpolator.get_interpolated_point()[2])
+
+
+# one station set and waypoint with new velocities every minute, interpolated one step at a time and by one operator
+def series_time(stations, waypoint, velocities, num_steps: int):
+    init_time = perf_counter()
+    for step in velocities[:num_steps]:
+        numpy_velocity(np.column_stack([stations[:, :2], step]), waypoint)
+    step_time = (perf_counter() - init_time) / num_steps
+    init_time = perf_counter()
+    InterpolationOperator(stations, waypoint).apply(velocities)
+    return step_time * len(velocities), perf_counter() - init_time
+
+
+# a spline evaluated over a whole range at once and as chunks, with the time and peak memory of each
+def stream_time(spline: SplineCoefficients, start, stop, step):
+    tracemalloc.start()
+    init_time = perf_counter()
+    spline.frame('stamp', 'velocity', start, stop, step)
+    frame_time, frame_memory = perf_counter() - init_time, tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    init_time = perf_counter()
+    for _ in spline.chunks(start, stop, step, dtype=np.float32):
+        pass
+    chunks_time, chunks_memory = perf_counter() - init_time, tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return frame_time, frame_memory, chunks_time, chunks_memory
+
+
+def elapsed_time(velocity, cases):
+    init_time = perf_counter()
+    velocities = [velocity(stations, waypoint) for stations, waypoint in cases]
+    return perf_counter() - init_time, np.array(velocities)
+
+
+if __name__ == '__main__':
+    # python benchmark.py [number of interpolations]
+    args = sys.argv[1:]
+    num_cases = int(args[0]) if len(args) > 0 else 20
+    rng = np.random.default_rng(0)
+
+    print(f'{num_cases} interpolations per shape')
+    for label, num_points in [('line', 2), ('triangle', 3), ('quad', 4)]:
+        cases = [random_case(rng, num_points) for _ in range(num_cases)]
+        sympy_time, sympy_velocities = elapsed_time(sympy_velocity, cases)
+        numpy_time, numpy_velocities = elapsed_time(numpy_velocity, cases)
+        difference = np.abs(sympy_velocities - numpy_velocities).max()
+        print(f'{label:>10}: sympy {sympy_time / num_cases * 1e3:9.2f} ms, numpy {numpy_time / num_cases * 1e3:7.3f} ms, '
+              f'{sympy_time / numpy_time:7.0f}x, largest difference {difference:.1e}', flush=True)
+
+    minutes = 16 * 31 * 24 * 60
+    stations, waypoint = random_case(rng, 4)
+    step_time, operator_time = series_time(stations, waypoint, rng.uniform(-3, 3, (minutes, 4)), 200)
+    print(f'\n{minutes} minutes: {step_time:.0f} s one step at a time (estimated from 200), {operator_time:.3f} s by operator')
+
+    seconds = 3 * 365 * 24 * 3600
+    hours = np.arange(0, seconds + 3600, 3600)
+    spline = SplineCoefficients.fit(Series(hours), Series(3 * np.sin(hours * 2 * np.pi / 44712)))
+    frame_time, frame_memory, chunks_time, chunks_memory = stream_time(spline, 0, seconds, 10)
+    print(f'\n3 years every 10 s: {frame_time:.2f} s {frame_memory / 1e6:.0f} MB as one frame, {chunks_time:.2f} s {chunks_memory / 1e6:.1f} MB as float32 chunks')
@@ -1,45 +1,51 @@
 import numpy as np
 from pandas import Series
-from sympy.geometry import Point3D, Line, Segment, Plane
-from sympy import symbols
+from pathlib import Path
 
-from scipy.interpolate import Rbf, CubicSpline
+from scipy.interpolate import Rbf, CubicSpline, PPoly
+from scipy.linalg import solve
+from scipy.spatial.distance import cdist
+from scipy.special import xlogy
 from matplotlib import pyplot as plot
 
 from tt_exceptions.exceptions import DuplicateValues, LengthMismatch, NonMonotonic
 from tt_dataframe.dataframe import DataFrame
 
 
-def step_size(segments): return np.array([s.length for s in segments]).min() / Interpolator.num_edge_points
+# segments are an array of (start, end) point pairs
+def segment_lengths(segments): return np.linalg.norm(segments[:, 1] - segments[:, 0], axis=1)
+
+
+def step_size(segments): return segment_lengths(segments).min() / Interpolator.num_edge_points
 
 
 def edge_points(segments, ss):
-    t = symbols('t')
     edge_pts = []
-    for segment in segments:
-        num_pts = range(1, int(round(segment.length / ss, 0)))
-        edge_pts += [segment.arbitrary_point(t).evalf(subs={t: pt*ss/segment.length}) for pt in num_pts]
-    return np.array(edge_pts).astype(float)
+    for (start, end), length in zip(segments, segment_lengths(segments)):
+        t = np.arange(1, int(round(length / ss, 0))) * ss / length
+        edge_pts.append(start + t[:, None] * (end - start))
+    return np.concatenate(edge_pts)
 
 
 # noinspection PyPep8Naming
 class Interpolator:
+    # points are (x, y, z) coordinates, x and y are scaled up so the surface is not squashed flat against the z values
 
     scale = 10000
     num_edge_points = 10
     mesh_density = 300
+    smooth = 100.0  # of the thin plate surface
     LINE = 'LINE'
     SURFACE = 'SURFACE'
-    XY_PLANE = Plane(Point3D(0, 0, 0), normal_vector=[0, 0, 1])
 
-    def plot_segment(self, segment: Segment, color: str, style: str, weight: float):
-        if segment.length == 0:
+    def plot_segment(self, start: np.ndarray, end: np.ndarray, color: str, style: str, weight: float):
+        if np.array_equal(start, end):
             return
-        points = np.array(segment.points).astype(float)
+        points = np.array([start, end])
         self.ax.plot3D(points[:, 0], points[:, 1], points[:, 2], c=color, linestyle=style, linewidth=weight)
 
-    def plot_point(self, pt: Point3D, color: str, mark: str):
-        self.ax.scatter(pt.x, pt.y, pt.z, c=color, marker=mark)
+    def plot_point(self, pt: np.ndarray, color: str, mark: str):
+        self.ax.scatter(pt[..., 0], pt[..., 1], pt[..., 2], c=color, marker=mark)
 
     def show_axes(self):
         if self.ax is None:
@@ -52,10 +58,12 @@ class Interpolator:
         self.ax.scatter(self.input_plot_points[0], self.input_plot_points[1], self.input_plot_points[2], c='black', marker='.')
 
         if self.shape == Interpolator.LINE:
-            z_intercept = Interpolator.XY_PLANE.intersection(Line(self.linear_range))[0]
-            self.plot_point(z_intercept, 'black', '.')
-            self.plot_segment(Segment(z_intercept, self.linear_range.p2), 'grey', '--', 0.5)
-            self.plot_segment(Segment(z_intercept, self.input_point), 'grey', '--', 0.5)
+            start, end = self.linear_range
+            if end[2] != start[2]:  # where the line crosses the xy plane
+                z_intercept = start + (end - start) * start[2] / (start[2] - end[2])
+                self.plot_point(z_intercept, 'black', '.')
+                self.plot_segment(z_intercept, end, 'grey', '--', 0.5)
+                self.plot_segment(z_intercept, self.input_point, 'grey', '--', 0.5)
         if self.shape == Interpolator.SURFACE:
             self.ax.plot_wireframe(XI, YI, self.surface(XI, YI), rstride=10, cstride=10, color='grey', linewidth=0.25)
             self.plot_point(self.output_point, 'red', 'o')
@@ -77,7 +85,7 @@ class Interpolator:
         if self.ax is None:
             self.ax = plot.axes(projection="3d")
         self.plot_point(self.output_point, 'red', 'o')
-        self.plot_segment(Segment(self.input_point, self.output_point), 'black', '--', 0.25)
+        self.plot_segment(self.input_point, self.output_point, 'black', '--', 0.25)
         plot.show(block=False)
         plot.pause(0.001)
         return None
@@ -86,62 +94,175 @@ class Interpolator:
     def close_plot():
         plot.close('all')
 
-    def set_interpolation_point(self, pt: Point3D):
-        if not isinstance(pt, Point3D):
+    # one point of shape (3,) or many of shape (n, 3)
+    def set_interpolation_point(self, pt):
+        pt = np.asarray(pt, dtype=float)
+        if pt.shape[-1:] != (3,):
             raise TypeError
-        self.input_point = pt.scale(Interpolator.scale, Interpolator.scale, 1)
+        self.input_point = pt * self.scaling
 
+    # z on the surface below each point, or the point's projection onto the line
     def get_interpolated_point(self):
         if self.shape == Interpolator.SURFACE:
-            self.output_point = Point3D(self.input_point.x, self.input_point.y, self.surface(self.input_point.x, self.input_point.y).tolist())
+            self.output_point = self.input_point.copy()
+            self.output_point[..., 2] = self.surface(self.input_point[..., 0], self.input_point[..., 1])
         elif self.shape == Interpolator.LINE:
-            self.output_point = Line(self.linear_range).projection(self.input_point)
-        return self.output_point.scale(1/Interpolator.scale, 1/Interpolator.scale, 1)
+            start, end = self.linear_range
+            direction = end - start
+            t = (self.input_point - start) @ direction / (direction @ direction)
+            self.output_point = start + t[..., None] * direction
+        return self.output_point / self.scaling
 
     def __init__(self, *points):
         self.input_point = self.output_point = self.shape = self.linear_range = None
         self.input_plot_points = self.edge_plot_points = self.x_limits = self.y_limits = None
         self.ax = self.surface = None
+        self.scaling = np.array([Interpolator.scale, Interpolator.scale, 1])
         self.initialize([*points][0])
 
-    def initialize(self, pts: Point3D):
+    def initialize(self, pts):
+        pts = np.asarray(pts, dtype=float)
+        if pts.ndim != 2 or pts.shape[1] != 3:
+            raise TypeError
         if len(pts) < 2:
             raise ValueError
-        for pt in pts:
-            if not isinstance(pt, Point3D):
-                raise TypeError
 
         if len(pts) == 2:
             self.shape = Interpolator.LINE
         else:
             self.shape = Interpolator.SURFACE
 
-        scaled_point_list = [pt.scale(Interpolator.scale, Interpolator.scale, 1) for pt in pts]
-        closed_figure = scaled_point_list + [scaled_point_list[0]]
-        segments = [Segment(pt, closed_figure[index+1]) for index, pt in enumerate(closed_figure[:-1])]
+        figure_point_array = pts * self.scaling
+        segments = np.stack([figure_point_array, np.roll(figure_point_array, -1, axis=0)], axis=1)  # closed figure
         self.linear_range = segments[0]
         ss = step_size(segments)
         edge_point_array = edge_points(segments, ss)
 
-        figure_point_array = np.array(scaled_point_list).astype(float)
         self.input_plot_points = [figure_point_array[:, 0], figure_point_array[:, 1], figure_point_array[:, 2]]
         self.edge_plot_points = [edge_point_array[:, 0], edge_point_array[:, 1], edge_point_array[:, 2]]
         self.x_limits = [int(round(self.input_plot_points[0].min(), 0)), int(round(self.input_plot_points[0].max(), 0))]
         self.y_limits = [int(round(self.input_plot_points[1].min(), 0)), int(round(self.input_plot_points[1].max(), 0))]
 
         if self.shape == Interpolator.SURFACE:
-            self.surface = Rbf(self.edge_plot_points[0], self.edge_plot_points[1], self.edge_plot_points[2], function='thin_plate', smooth=100.0)
+            self.surface = Rbf(self.edge_plot_points[0], self.edge_plot_points[1], self.edge_plot_points[2], function='thin_plate', smooth=Interpolator.smooth)
 
 
-class CubicSplineFrame(DataFrame):
-    def __init__(self, x: Series | np.ndarray | list, y: Series | np.ndarray | list, spline_x: Series | np.ndarray | list):
+def thin_plate(r): return xlogy(r ** 2, r)  # the Rbf kernel the interpolator's surface uses
+
+
+class InterpolationOperator:
+    # the interpolator's z at a target point as a linear map of the z values at a fixed set of points, for series where only z changes
+    # edge points are spaced by x, y distance so they do not move with z, the kernel is built and solved once per target and point set
+    # a surface is then one weight per point, a line the projection of the target onto each time step's line
+
+    def apply(self, z):  # z values of the points, shape (n,) or one row per time step (t, n)
+        z = np.asarray(z, dtype=float)
+        if self.shape == Interpolator.SURFACE:
+            return z @ self.weights
+        (x0, y0), (x1, y1) = self.points
+        z0, dz = z[..., 0], z[..., 1] - z[..., 0]
+        dx, dy = x1 - x0, y1 - y0
+        t = (dx * (self.target[0] - x0) + dy * (self.target[1] - y0) - z0 * dz) / (dx * dx + dy * dy + dz * dz)
+        return z0 + t * dz
+
+    # operators are kept per process by target and points, so jobs for one waypoint reuse them
+    @staticmethod
+    def cached(points, target):
+        points, target = np.asarray(points, dtype=float)[:, :2], np.asarray(target, dtype=float)[:2]
+        key = (points.tobytes(), target.tobytes())
+        if key not in OPERATORS:
+            OPERATORS[key] = InterpolationOperator(points, target)
+        return OPERATORS[key]
+
+    def __init__(self, points, target):
+        scaling = np.array([Interpolator.scale, Interpolator.scale])
+        self.points = np.asarray(points, dtype=float)[:, :2] * scaling
+        self.target = np.asarray(target, dtype=float)[:2] * scaling
+        if len(self.points) < 2:
+            raise ValueError
+        self.shape = Interpolator.LINE if len(self.points) == 2 else Interpolator.SURFACE
+        self.weights = None
+        if self.shape == Interpolator.SURFACE:
+            # each edge point is a fixed blend of the two points of its segment, so its z is a row of edge_weights times the points' z
+            segments = np.stack([np.arange(len(self.points)), np.roll(np.arange(len(self.points)), -1)], axis=1)
+            lengths = segment_lengths(self.points[segments])
+            ss = lengths.min() / Interpolator.num_edge_points
+            edge_weights = []
+            for (start, end), length in zip(segments, lengths):
+                t = np.arange(1, int(round(length / ss, 0))) * ss / length
+                rows = np.zeros((len(t), len(self.points)))
+                rows[:, start], rows[:, end] = 1 - t, t
+                edge_weights.append(rows)
+            edge_weights = np.concatenate(edge_weights)
+            edges = edge_weights @ self.points
+            kernel = thin_plate(cdist(edges, edges)) - np.eye(len(edges)) * Interpolator.smooth
+            self.weights = solve(kernel, thin_plate(cdist(self.target[None], edges))[0], assume_a='sym') @ edge_weights
+
+
+OPERATORS = {}  # (points, target) -> operator, see InterpolationOperator.cached
+
+
+class SplineCoefficients:
+    # the knots and per interval cubic coefficients of a CubicSpline, a few numbers per knot where a dense frame has a row per step
+    # evaluated on demand over any range and step, grid is the (start, stop, step) its dense frame is wanted on by default
 
+    chunk_size = 1 << 16  # values per chunk when streamed
+
+    @staticmethod
+    def fit(x: Series, y: Series, grid: tuple = None):
         if not x.is_unique:
             raise DuplicateValues(f'Duplicate x values')
         if not x.is_monotonic_increasing:
             raise NonMonotonic(f'x values not monotonic')
         if len(x) != len(y):
             raise LengthMismatch(f'x series and y series have different lengths')
-
         cs = CubicSpline(x, y)
-        super().__init__(DataFrame({x.name: spline_x, y.name: cs(spline_x)}))
+        return SplineCoefficients(cs.x, cs.c, grid)
+
+    @staticmethod
+    def read(path: Path):
+        with np.load(path) as arrays:
+            return SplineCoefficients(arrays['knots'], arrays['coefficients'], tuple(arrays['grid'].tolist()) or None)
+
+    def write(self, path: Path):
+        with open(path, 'wb') as spline_file:  # an open file keeps numpy from adding its own suffix
+            np.savez(spline_file, knots=self.spline.x, coefficients=self.spline.c, grid=np.array(self.grid or [], dtype=np.int64))
+        return path
+
+    def evaluate(self, x):
+        return self.spline(np.asarray(x, dtype=float))
+
+    # start, stop and number of steps of a range like np.arange's, the grid's where not given
+    def steps(self, start, stop, step):
+        grid_start, grid_stop, grid_step = self.grid or (None, None, None)
+        start, stop, step = grid_start if start is None else start, grid_stop if stop is None else stop, grid_step if step is None else step
+        return start, step, max(0, int(np.ceil((stop - start) / step)))
+
+    def frame(self, x_name: str, y_name: str, start=None, stop=None, step=None, dtype=np.float64):
+        start, step, count = self.steps(start, stop, step)
+        x = start + step * np.arange(count)
+        return DataFrame({x_name: x, y_name: self.evaluate(x).astype(dtype, copy=False)})
+
+    # (x, y) arrays of at most chunk_size steps each, so a long or fine range is never held at once
+    def chunks(self, start=None, stop=None, step=None, chunk_size: int = None, dtype=np.float64):
+        start, step, count = self.steps(start, stop, step)
+        chunk_size = chunk_size or SplineCoefficients.chunk_size
+        for first in range(0, count, chunk_size):
+            x = start + step * np.arange(first, min(first + chunk_size, count))
+            yield x, self.evaluate(x).astype(dtype, copy=False)
+
+    def __init__(self, knots: np.ndarray, coefficients: np.ndarray, grid: tuple = None):
+        self.spline = PPoly.construct_fast(np.asarray(coefficients, dtype=float), np.asarray(knots, dtype=float))
+        self.grid = grid
+
+
+class CubicSplineFrame(DataFrame):
+
+    # the spline's values over start, stop and step as chunks of typed arrays rather than one frame, see SplineCoefficients.chunks
+    @staticmethod
+    def stream(x: Series, y: Series, start, stop, step, chunk_size: int = None, dtype=np.float64):
+        return SplineCoefficients.fit(x, y).chunks(start, stop, step, chunk_size, dtype)
+
+    def __init__(self, x: Series | np.ndarray | list, y: Series | np.ndarray | list, spline_x: Series | np.ndarray | list):
+        spline = SplineCoefficients.fit(x, y)
+        super().__init__(DataFrame({x.name: spline_x, y.name: spline.evaluate(spline_x)}))
@@ -0,0 +1,85 @@
+from multiprocessing import Manager, Pool, Process, JoinableQueue, cpu_count
+from time import sleep, perf_counter
+from pathlib import Path
+import sys
+
+from tt_semaphore import simple_semaphore as semaphore
+from tt_os_abstraction.os_abstraction import env
+from tt_job_manager.job_manager import Job, QueueManager
+
+
+class PollingQueueManager:  # the original sleep(1) polling loop, kept for comparison
+
+    def __init__(self, q, results_dict, retained, size, *args):
+        semaphore.on(QueueManager.__name__)
+        job_key_dict = {}
+        with Pool(size) as p:
+            while semaphore.is_on(QueueManager.__name__):
+                while not q.empty():
+                    job = q.get()
+                    job_key_dict[job.result_key] = p.apply_async(job.execute, callback=job.execute_callback, error_callback=job.error_callback)
+                for key in list(job_key_dict.keys()):
+                    if job_key_dict[key].ready():
+                        async_return = job_key_dict.pop(key)
+                        try:
+                            results_dict[key] = async_return.get()
+                        except Exception as e:
+                            results_dict[key] = e
+                        q.task_done()
+                sleep(1)
+
+
+class QuietJob(Job):
+
+    def execute(self): return self.execute_function(*self.execute_function_arguments)
+    def execute_callback(self, result, message: str = None): return None
+    def error_callback(self, error): return None
+
+    def __init__(self, index: int, duration: float):
+        super().__init__(f'bench {index}', index, sleep, [duration], {})
+
+
+def elapsed_time(manager_class, num_jobs: int, duration: float, pool_size: int, batch_key=None, batch_size=100, batch_time=0.05):
+    if semaphore.is_on(QueueManager.__name__):
+        semaphore.off(QueueManager.__name__)
+    q = JoinableQueue()
+    trace_path = Path(env('temp')).joinpath('benchmark_trace.jsonl')
+    with Manager() as manager:
+        results, retained = manager.dict(), manager.dict()
+        process = Process(target=manager_class, args=(q, results, retained, pool_size, batch_size, batch_time, trace_path, 1))
+        process.start()
+        semaphore.wait(QueueManager.__name__)
+        init_time = perf_counter()
+        for i in range(num_jobs):
+            job = QuietJob(i, duration)
+            job.batch_key = batch_key
+            q.put(job)
+        q.join()
+        elapsed = perf_counter() - init_time
+        semaphore.off(QueueManager.__name__)
+        process.join()
+    return elapsed
+
+
+if __name__ == '__main__':
+    # python benchmark.py [number of jobs] [seconds per job] [pool size]
+    args = sys.argv[1:]
+    num_jobs = int(args[0]) if len(args) > 0 else 1000
+    duration = float(args[1]) if len(args) > 1 else 0.001
+    pool_size = int(args[2]) if len(args) > 2 else cpu_count()
+
+    print(f'{num_jobs} jobs of {duration}s on {pool_size} processes')
+    for manager_class in [PollingQueueManager, QueueManager]:
+        elapsed = elapsed_time(manager_class, num_jobs, duration, pool_size)
+        print(f'{manager_class.__name__:>20}: {num_jobs / elapsed:10.1f} jobs/sec', flush=True)
+
+    # overhead per job is the wall time per job beyond the work itself, spread over the pool
+    # a burst smaller than a batch is spread over the pool too, so batching is never slower than a task per job
+    for burst in sorted({min(60, num_jobs), num_jobs}):
+        print(f'\nper job overhead, {burst} jobs')
+        overheads = {}
+        for label, batch_key in [('one task per job', None), ('batched', 'bench')]:
+            elapsed = elapsed_time(QueueManager, burst, duration, pool_size, batch_key)
+            overheads[label] = (elapsed * pool_size / burst - duration) * 1e6
+            print(f'{label:>20}: {overheads[label]:10.1f} us', flush=True)
+        assert overheads['batched'] <= overheads['one task per job'], f'batches of {burst} jobs are slower than a task per job'
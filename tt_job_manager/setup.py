@@ -3,5 +3,6 @@ from setuptools import setup, find_packages
 setup(
     name='tt_job_manager',
     packages=find_packages(include=['tt_job_manager', 'tt_job_manager.*']),
-    install_requires=['tt_singleton', 'tt_semaphore']
+    install_requires=['tt_singleton', 'tt_semaphore', 'tt_os_abstraction', 'tt_dataframe', 'numpy', 'pandas'],
+    extras_require={'memory': ['psutil']}  # job_memory reads /proc without it, memory is not tracked where there is none
 )
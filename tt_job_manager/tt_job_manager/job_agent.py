@@ -0,0 +1,75 @@
+from multiprocessing import Pool, cpu_count
+from threading import BoundedSemaphore
+from functools import partial
+from socket import gethostname
+from queue import Empty
+from pathlib import Path
+import sys
+
+from tt_job_manager.shared_frame import SharedFrame
+from tt_job_manager.job_manager import QueueManager, execute_batch
+from tt_job_manager.job_coordinator import AgentLink, ShippedFile, JOIN, LEAVE, DONE, FAILED
+from tt_job_manager.job_authkey import authkey
+
+
+# shared results are returned as frames, a segment on this host means nothing to the coordinator
+def execute_remote(jobs: list, path_map: dict):
+    for job in jobs:
+        job.execute_function_arguments = ShippedFile.resolve(job.execute_function_arguments, path_map)
+        job.execute_function_keyword_arguments = ShippedFile.resolve(job.execute_function_keyword_arguments, path_map)
+    outcomes = []
+    for success, result, trace in execute_batch(jobs):
+        if isinstance(result, SharedFrame):
+            frame = result.attach()
+            result.unlink()
+            result = frame
+        outcomes.append((success, result, trace | {'host': gethostname()}))
+    return outcomes
+
+
+# pulls tasks from a coordinator, JobManager(agents_address=...), and runs them in a pool on this host
+def agent(address: tuple, processes=cpu_count(), path_map: dict = None):
+    link = AgentLink(address=address, authkey=authkey(address))
+    link.connect()
+    tasks, done = link.get_tasks(), link.get_done()
+    slots = BoundedSemaphore(processes * (1 + QueueManager.prefetch))
+    running = set()
+
+    def finished(task_id, outcomes):
+        running.discard(task_id)
+        done.put((DONE, task_id, outcomes))
+        slots.release()
+
+    def failed(task_id, error):
+        running.discard(task_id)
+        done.put((FAILED, task_id, error))
+        slots.release()
+
+    print(f'+     agent ({processes} processes) for {address[0]}:{address[1]}', flush=True)
+    with Pool(processes) as pool:
+        done.put((JOIN, processes))
+        try:
+            while True:
+                slots.acquire()
+                try:
+                    task_id, jobs = tasks.get(timeout=1)
+                except Empty:
+                    slots.release()
+                    continue
+                running.add(task_id)
+                pool.apply_async(execute_remote, (jobs, path_map), callback=partial(finished, task_id), error_callback=partial(failed, task_id))
+        except (EOFError, ConnectionError):
+            print(f'-     agent, coordinator has gone', flush=True)
+            return
+        except KeyboardInterrupt:
+            pass
+        done.put((LEAVE, processes, list(running)))  # the pool is terminated with them, the coordinator runs them again
+    print(f'-     agent', flush=True)
+
+
+if __name__ == '__main__':
+    # python -m tt_job_manager.job_agent host port [processes] [coordinator_folder=agent_folder ...]
+    args = sys.argv[1:]
+    processes = int(args[2]) if len(args) > 2 else cpu_count()
+    path_map = {Path(a.split('=')[0]): Path(a.split('=')[1]) for a in args[3:]}
+    agent((args[0], int(args[1])), processes, path_map)
@@ -0,0 +1,34 @@
+from os import environ, open as os_open, link, getpid
+from secrets import token_hex
+from pathlib import Path
+
+from tt_os_abstraction.os_abstraction import env
+
+VARIABLE = 'TT_JOB_MANAGER_AUTHKEY'
+LOOPBACK = {'localhost', '127.0.0.1', '::1'}
+
+
+# the key both ends of a connection present, TT_JOB_MANAGER_AUTHKEY where it is set, otherwise a key of this user on this host,
+# which no other host has, so an address other than loopback is refused without the variable
+def authkey(address: tuple) -> bytes:
+    key = environ.get(VARIABLE)
+    if key:
+        return key.encode()
+    if address[0] not in LOOPBACK:
+        raise PermissionError(f'{address[0]}:{address[1]} is not a loopback address, set {VARIABLE} to the key shared by its hosts')
+    return local_key()
+
+
+# a random key made by the first process that needs it, readable only by its user
+def local_key() -> bytes:
+    path = Path(env('user_profile')).joinpath('.tt_job_manager_authkey')
+    if not path.exists():
+        partial = path.with_name(f'{path.name}.{getpid()}')
+        with open(partial, 'w', opener=lambda name, flags: os_open(name, flags, 0o600)) as key_file:
+            key_file.write(token_hex(32))
+        try:
+            link(partial, path)  # never replaces a key another process made first
+        except FileExistsError:
+            pass
+        partial.unlink()
+    return path.read_text().strip().encode()
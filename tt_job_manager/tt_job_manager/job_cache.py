@@ -0,0 +1,126 @@
+from hashlib import sha256
+from pickle import dumps, loads, HIGHEST_PROTOCOL
+from pathlib import Path
+from os import getpid, replace, utime, environ
+import numpy as np
+from pandas import DataFrame as PandasDataFrame, Series
+from pandas.util import hash_pandas_object
+
+from tt_os_abstraction.os_abstraction import env
+
+FILE_HASHES = {}  # (path, modified, size) -> content hash, per process
+
+
+class JobCache:
+    # results stored under a hash of the function that made them, fingerprints of its arguments and the job's version tag
+    # a file argument is fingerprinted by its contents, so a result is reused whatever route folder the file is in
+
+    directory = None  # defaults to .cache/tt_job_manager in the user profile
+    # bytes kept before the least recently used results are evicted, TT_JOB_CACHE_SIZE where it is set
+    # large enough for the results of a whole sixteen speed route run, so a rerun finds them all
+    max_size = int(environ.get('TT_JOB_CACHE_SIZE', 32 * 2 ** 30))
+    suffix = '.pickle'
+    attribute = 'job_cache_key'  # attrs entry of a cached frame, its key stands for its contents in the keys of its dependants
+
+    @staticmethod
+    def file_hash(path: Path) -> str:
+        stat = path.stat()
+        memo = (str(path), stat.st_mtime_ns, stat.st_size)
+        if memo not in FILE_HASHES:
+            digest = sha256()
+            with open(path, 'rb') as file:
+                while chunk := file.read(2 ** 20):
+                    digest.update(chunk)
+            FILE_HASHES[memo] = digest.hexdigest()
+        return FILE_HASHES[memo]
+
+    @staticmethod
+    def pandas_hash(value, digest):
+        try:
+            digest.update(hash_pandas_object(value, index=True).to_numpy().tobytes())
+        except TypeError:  # unhashable cells such as lists
+            digest.update(dumps(value, protocol=HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def fingerprint(value, digest):
+        digest.update(type(value).__qualname__.encode())
+        if isinstance(value, Path):
+            digest.update(JobCache.file_hash(value).encode() if value.is_file() else str(value).encode())
+        elif isinstance(value, PandasDataFrame) and JobCache.attribute in value.attrs:  # hashed once, by the job that made it
+            digest.update(value.attrs[JobCache.attribute].encode())
+        elif isinstance(value, PandasDataFrame):
+            digest.update(repr((list(value.columns), [str(dtype) for dtype in value.dtypes])).encode())
+            JobCache.pandas_hash(value, digest)
+        elif isinstance(value, Series):
+            digest.update(repr((value.name, str(value.dtype))).encode())
+            JobCache.pandas_hash(value, digest)
+        elif isinstance(value, np.ndarray):
+            digest.update(repr((value.dtype.str, value.shape)).encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                JobCache.fingerprint(item, digest)
+        elif isinstance(value, dict):
+            for key in sorted(value, key=repr):
+                JobCache.fingerprint(key, digest)
+                JobCache.fingerprint(value[key], digest)
+        else:
+            digest.update(repr(value).encode())
+
+    @staticmethod
+    def key(job, upstream_results: list) -> str:
+        function = job.execute_function
+        digest = sha256(f'{function.__module__}.{function.__qualname__} {job.cache_version}'.encode())
+        JobCache.fingerprint([upstream_results, job.execute_function_arguments, job.execute_function_keyword_arguments], digest)
+        return digest.hexdigest()
+
+    # a frame made by a cached job carries its key, one made by any other job must not carry a key copied from its inputs
+    @staticmethod
+    def mark(result, key: str = None):
+        if isinstance(result, PandasDataFrame):
+            if key is None:
+                result.attrs.pop(JobCache.attribute, None)
+            else:
+                result.attrs[JobCache.attribute] = key
+        return result
+
+    def path(self, key: str) -> Path:
+        return self.directory.joinpath(key).with_suffix(JobCache.suffix)
+
+    # (True, result) on a hit, the file's modified time records the last use
+    def get(self, key: str):
+        path = self.path(key)
+        try:
+            result = loads(path.read_bytes())
+        except Exception:  # missing, evicted while reading or pickled by code that has since changed
+            return False, None
+        utime(path)
+        return True, result
+
+    def put(self, key: str, result):
+        path = self.path(key)
+        partial = self.directory.joinpath(f'{key}.{getpid()}.partial')
+        partial.write_bytes(dumps(result, protocol=HIGHEST_PROTOCOL))
+        replace(partial, path)  # readers see the whole result or none of it
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for path in self.directory.glob('*' + JobCache.suffix):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # evicted by another worker
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        size = sum(entry[1] for entry in entries)
+        for modified, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+
+    def __init__(self, directory: Path = None, max_size: int = None):
+        directory = directory if directory is not None else JobCache.directory
+        self.directory = Path(directory) if directory is not None else Path(env('user_profile')).joinpath('.cache', 'tt_job_manager')
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size if max_size is not None else JobCache.max_size
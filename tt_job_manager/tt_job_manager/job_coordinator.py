@@ -0,0 +1,127 @@
+from multiprocessing.managers import BaseManager
+from queue import Queue, Empty
+from threading import Thread
+from hashlib import sha256
+from pathlib import Path
+from copy import copy
+
+from tt_os_abstraction.os_abstraction import env
+from tt_job_manager.shared_frame import SharedFrame
+from tt_job_manager.job_authkey import authkey
+
+JOIN = 'join'
+LEAVE = 'leave'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class AgentLink(BaseManager):  # what agents on other hosts connect to, with the key in TT_JOB_MANAGER_AUTHKEY on every host
+    pass
+
+AgentLink.register('get_tasks')
+AgentLink.register('get_done')
+
+
+class ShippedFile:
+    # the contents of a local input file, sent along with a job to an agent that may not see the file
+
+    directory = None  # where agents write shipped files, defaults to tt_job_agent in the temp folder
+
+    @staticmethod
+    def ship(value):
+        if isinstance(value, Path) and value.is_file():
+            return ShippedFile(value)
+        if isinstance(value, (list, tuple)):
+            return type(value)(ShippedFile.ship(v) for v in value)
+        if isinstance(value, dict):
+            return {k: ShippedFile.ship(v) for k, v in value.items()}
+        return value
+
+    # shipped files become local copies, other paths are rewritten by the agent's path map of {coordinator prefix: agent prefix}
+    @staticmethod
+    def resolve(value, path_map: dict = None):
+        if isinstance(value, ShippedFile):
+            return value.local_path()
+        if isinstance(value, Path):
+            for prefix, local in (path_map or {}).items():
+                if value.is_relative_to(prefix):
+                    return Path(local).joinpath(value.relative_to(prefix))
+            return value
+        if isinstance(value, (list, tuple)):
+            return type(value)(ShippedFile.resolve(v, path_map) for v in value)
+        if isinstance(value, dict):
+            return {k: ShippedFile.resolve(v, path_map) for k, v in value.items()}
+        return value
+
+    # copies are kept by content, so a file shipped again is not rewritten
+    def local_path(self):
+        directory = Path(ShippedFile.directory) if ShippedFile.directory is not None else Path(env('temp')).joinpath('tt_job_agent')
+        path = directory.joinpath(self.digest, self.name)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partial = path.with_name(path.name + '.partial')
+            partial.write_bytes(self.content)
+            partial.replace(path)
+        return path
+
+    def __init__(self, path: Path):
+        self.name = path.name
+        self.content = path.read_bytes()
+        self.digest = sha256(self.content).hexdigest()
+
+
+class Coordinator:
+    # hands process pool tasks to agents on other hosts over tcp and collects their outcomes
+    # agents announce their processes when they join and return the tasks they had not finished when they leave
+
+    # task ids are the queue manager's, which drops outcomes of tasks it no longer waits for
+    def send(self, task_id, jobs: list):
+        remote_jobs = []
+        for job in jobs:
+            remote_job = copy(job)  # upstream frames and files travel with the job, the local job keeps its handles
+            remote_job.upstream_results = [r.attach() if isinstance(r, SharedFrame) else r for r in job.upstream_results]
+            if self.ship_files:
+                remote_job.execute_function_arguments = ShippedFile.ship(job.execute_function_arguments)
+                remote_job.execute_function_keyword_arguments = ShippedFile.ship(job.execute_function_keyword_arguments)
+            remote_jobs.append(remote_job)
+        self.tasks.put((task_id, remote_jobs))
+
+    # tasks no agent will take, once the last agent has left
+    def unsent(self):
+        task_ids = []
+        while True:
+            try:
+                task_id, _ = self.tasks.get_nowait()
+            except Empty:
+                return task_ids
+            task_ids.append(task_id)
+
+    def collect(self):
+        while True:
+            message = self.done.get()
+            if message[0] == JOIN:
+                self.joined(message[1])
+            elif message[0] == LEAVE:
+                self.left(message[1], message[2])
+            elif message[0] == DONE:
+                # frames came back pickled, they are shared here like the results of the local pool
+                outcomes = [(success, SharedFrame.share(result) if success else result, trace) for success, result, trace in message[2]]
+                self.completed(message[1], outcomes)
+            elif message[0] == FAILED:
+                self.failed(message[1], message[2])
+
+    def __init__(self, address: tuple, ship_files: bool, joined, left, completed, failed):
+        self.tasks = Queue()
+        self.done = Queue()  # join, leave and outcome messages from the agents
+        self.ship_files = ship_files
+        self.joined, self.left, self.completed, self.failed = joined, left, completed, failed
+
+        class Listener(AgentLink):
+            pass
+
+        Listener.register('get_tasks', callable=lambda: self.tasks)
+        Listener.register('get_done', callable=lambda: self.done)
+        server = Listener(address=address, authkey=authkey(address)).get_server()
+        Thread(target=server.serve_forever, daemon=True).start()
+        Thread(target=self.collect, daemon=True).start()
+        print(f'+     coordinator listening for agents on {address[0]}:{address[1]}', flush=True)
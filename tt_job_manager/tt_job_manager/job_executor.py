@@ -0,0 +1,161 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from queue import Queue
+from threading import RLock, Condition, get_native_id
+from time import time
+from os import getpid
+from pathlib import Path
+
+from tt_job_manager.job_trace import JobTrace, payload_size
+
+INLINE = 'inline'
+THREAD = 'thread'
+PROCESS = 'process'
+AUTO = 'auto'  # chosen once from the first burst, see JobManager.hold
+
+
+class Forget:
+    # ids of finished jobs whose futures the submitter has let go of, put on the queue like a job
+    def __init__(self, job_ids: list):
+        self.job_ids = job_ids
+
+
+class LocalExecutor:
+    # runs jobs in the submitting process, inline as they are submitted or on a thread pool, for runs too small to pay for
+    # starting the manager, the queue manager and the process pool
+    # it stands in for the job manager's queue, results dict and completed queue, so submit_job and get_result are unchanged
+    # jobs start in the order they become ready, priorities, batches, memory budgets, timeouts and journals need the process pool
+
+    def put(self, job):
+        if isinstance(job, Forget):
+            with self.lock:
+                return self.forget(job.job_ids)
+        job.trace['dispatch'] = time()
+        with self.lock:
+            self.unfinished += 1
+            upstream_ids = []
+            for dependency in job.dependencies:  # an upstream job id or the result key of the latest job submitted with it
+                upstream_id = dependency if dependency in self.job_keys else self.latest.get(dependency)
+                if upstream_id is None:
+                    return self.finish(job, False, KeyError(f'no job submitted for dependency {dependency}'))
+                if upstream_id in self.finished and upstream_id not in self.results and upstream_id not in self.results_dict:
+                    return self.finish(job, False, KeyError(f'result {self.job_keys[upstream_id]} was collected before {job.job_name} was submitted'))
+                upstream_ids.append(upstream_id)
+            self.job_keys[job.job_id] = job.result_key
+            self.latest[job.result_key] = job.job_id
+            self.upstream[job.job_id] = upstream_ids
+            for upstream_id in upstream_ids:
+                self.dependants[upstream_id] = self.dependants.get(upstream_id, 0) + 1
+                self.depended.add(upstream_id)
+                if upstream_id not in self.finished:
+                    self.blocked.setdefault(upstream_id, []).append(job)
+                elif upstream_id not in self.results:
+                    self.results[upstream_id] = self.results_dict[upstream_id]
+            self.release_if_ready(job)
+        self.run_ready()
+
+    def release_if_ready(self, job):
+        upstream_ids = self.upstream[job.job_id]
+        if any(upstream_id not in self.finished for upstream_id in upstream_ids):
+            return
+        job.upstream_results = [self.results[upstream_id] for upstream_id in upstream_ids]
+        job.trace['argument_size'] = payload_size([job.execute_function_arguments, job.execute_function_keyword_arguments, job.upstream_results])
+        errors = [result for result in job.upstream_results if isinstance(result, Exception)]
+        if errors:
+            self.finish(job, False, errors[0])
+        elif self.pool is not None:
+            self.pool.submit(self.run, job)
+        else:
+            self.ready.append(job)
+
+    # inline jobs run on the submitting thread, a job released by one that finishes runs after it rather than inside it
+    def run_ready(self):
+        if self.pool is not None or self.running:
+            return
+        self.running = True
+        try:
+            while self.ready:
+                self.run(self.ready.popleft())
+        finally:
+            self.running = False
+
+    def run(self, job):
+        job.trace |= {'pid': getpid(), 'tid': get_native_id(), 'start': time()}
+        job.share = False  # nothing to share within one process
+        try:
+            result, success = job.execute(), True
+            job.trace |= {'end': time(), 'result_size': payload_size(result)}
+        except Exception as e:
+            result, success = e, False
+            job.trace['end'] = time()
+        with self.lock:
+            self.finish(job, success, result)
+
+    def finish(self, job, success, result):
+        if success:
+            try:
+                job.execute_callback(result)
+            except Exception as e:
+                job.error_callback(e)
+        else:
+            job.error_callback(result)
+        job.trace['callback'] = time()
+        self.trace.record(job, result)
+        self.trace.flush()
+        self.finished.add(job.job_id)
+        self.results_dict[job.job_id] = result
+        if self.dependants.get(job.job_id, 0):
+            self.results[job.job_id] = result
+        for upstream_id in self.upstream.pop(job.job_id, []):
+            self.dependants[upstream_id] -= 1
+            if not self.dependants[upstream_id]:
+                del self.dependants[upstream_id]
+                del self.results[upstream_id]
+                if upstream_id in self.unheld:
+                    self.drop(upstream_id)
+        for dependant in self.blocked.pop(job.job_id, []):
+            self.release_if_ready(dependant)
+        self.completed.put([job.job_id])
+        self.unfinished -= 1
+        if not self.unfinished:
+            self.idle.notify_all()
+
+    # a result other jobs depended on is dropped once they have finished and its future is let go of,
+    # one no job depended on is kept for get_result by its key
+    def forget(self, job_ids: list):
+        for job_id in job_ids:
+            if job_id not in self.depended:
+                continue
+            if self.dependants.get(job_id, 0):
+                self.unheld.add(job_id)
+            else:
+                self.drop(job_id)
+
+    def drop(self, job_id):
+        self.unheld.discard(job_id)
+        self.results_dict.pop(job_id, None)
+
+    def join(self):
+        with self.idle:
+            self.idle.wait_for(lambda: not self.unfinished)
+
+    # threads is the size of the thread pool, none runs the jobs inline
+    def __init__(self, threads: int, trace_path: Path):
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix='job') if threads else None
+        self.lock = RLock()
+        self.idle = Condition(self.lock)
+        self.results_dict = {}  # job id -> result, until it is collected
+        self.completed = Queue()  # job ids of each finished job, for the futures
+        self.job_keys = {}  # job id -> result key, for every submitted job
+        self.latest = {}  # result key -> id of the latest job submitted with that key
+        self.upstream = {}  # job id -> upstream job ids, until the job finishes
+        self.dependants = {}  # job id -> number of unfinished dependants
+        self.blocked = {}  # upstream job id -> dependants waiting for it
+        self.results = {}  # job id -> result, while dependants need it
+        self.depended = set()  # ids of the jobs that had dependants
+        self.unheld = set()  # ids of those whose futures were let go of while dependants still needed them
+        self.finished = set()
+        self.ready = deque()  # inline jobs released and not yet run
+        self.running = False
+        self.unfinished = 0
+        self.trace = JobTrace(trace_path)
@@ -0,0 +1,75 @@
+from heapq import heapify, heapreplace
+from pathlib import Path
+import json
+
+import numpy as np
+
+SECONDS = 'seconds'
+MEMORY = 'memory'
+RECENT = 'recent'
+
+
+class JobHistory:
+    # running seconds and memory growth per job class and input size (power of two bucket of the argument bytes), kept between runs
+
+    smoothing = 0.3  # weight of the newest run in the moving average
+    recent_runs = 100  # seconds of the latest runs of each class kept for its percentiles
+    minimum_runs = 10  # runs of a class before its percentiles are taken
+
+    @staticmethod
+    def bucket(job):
+        return int(job.trace.get('argument_size') or 0).bit_length()
+
+    # longest processing time first onto the least loaded worker
+    @staticmethod
+    def makespan(durations: list, workers: int):
+        loads = [0.0] * max(1, min(workers, len(durations)))
+        heapify(loads)
+        for duration in sorted(durations, reverse=True):
+            heapreplace(loads, loads[0] + duration)
+        return max(loads)
+
+    # jobs of a class not seen at this size take the value of its nearest size, classes never run take none
+    def expected(self, job, measure=SECONDS):
+        sizes = self.measures[measure].get(type(job).__name__)
+        if not sizes:
+            return 0.0
+        bucket = self.bucket(job)
+        return sizes[min(sizes, key=lambda b: abs(int(b) - bucket))]
+
+    # over the recent runs of the job's class at any size
+    def percentile(self, job, q):
+        recent = self.measures[RECENT].get(type(job).__name__, [])
+        return float(np.percentile(recent, q)) if len(recent) >= JobHistory.minimum_runs else None
+
+    def update(self, job, measure, value):
+        sizes = self.measures[measure].setdefault(type(job).__name__, {})
+        bucket = str(self.bucket(job))
+        previous = sizes.get(bucket)
+        sizes[bucket] = value if previous is None else previous + JobHistory.smoothing * (value - previous)
+
+    def learn(self, job):
+        start, end = job.trace.get('start'), job.trace.get('end')
+        if start is not None and end is not None:
+            self.update(job, SECONDS, end - start)
+            recent = self.measures[RECENT].setdefault(type(job).__name__, [])
+            recent.append(end - start)
+            del recent[:-JobHistory.recent_runs]
+        if job.trace.get('memory') is not None:
+            self.update(job, MEMORY, job.trace['memory'])
+
+    def save(self):
+        with open(self.path, 'w') as history_file:
+            json.dump(self.measures, history_file)
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.measures = {SECONDS: {}, MEMORY: {}, RECENT: {}}  # measure -> job class -> size bucket -> value, recent seconds are a list per class
+        if Path(path).exists():
+            try:
+                with open(path) as history_file:
+                    measures = json.load(history_file)
+                if set(measures) <= set(self.measures):  # files from before a measure was added keep the others
+                    self.measures |= measures
+            except ValueError:
+                pass
@@ -0,0 +1,94 @@
+from hashlib import sha256
+from pickle import dumps, loads, HIGHEST_PROTOCOL
+from base64 import b64encode, b64decode
+from pathlib import Path
+import json
+
+from tt_job_manager.shared_frame import SharedFrame
+from tt_job_manager.job_cache import JobCache
+
+SUBMITTED = 'submitted'
+COMPLETED = 'completed'
+
+
+class JobJournal:
+    # append-only record of the jobs a queue manager was given and the results they left, one json line each,
+    # results are pickled next to it so a run that died can skip what finished and re-queue what did not
+    # delete the journal and its results folder to start over
+
+    # the same job in another run: class, function, name, key, arguments and the identities of its upstream jobs
+    @staticmethod
+    def identity(job, upstream_identities: list) -> str:
+        function = job.execute_function
+        digest = sha256(f'{type(job).__qualname__} {function.__module__}.{function.__qualname__} {job.job_name} {job.result_key!r}'.encode())
+        JobCache.fingerprint([job.execute_function_arguments, job.execute_function_keyword_arguments, upstream_identities], digest)
+        return digest.hexdigest()
+
+    @staticmethod
+    def read(path: Path):
+        records = []
+        if Path(path).exists():
+            with open(path) as journal_file:
+                for line in journal_file:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:  # the line being written when the run died
+                        pass
+        return records
+
+    # jobs submitted that never completed, in the order they were submitted
+    @staticmethod
+    def pending(path: Path):
+        submitted = {}
+        for record in JobJournal.read(path):
+            if record['event'] == SUBMITTED:
+                submitted[record['job_id']] = record['job']
+            else:
+                submitted.pop(record['job_id'], None)
+        return [loads(b64decode(job)) for job in submitted.values()]
+
+    def write(self, record: dict):
+        self.file.write(json.dumps(record) + '\n')
+
+    def submitted(self, job, identity: str):
+        self.identities[job.job_id] = identity
+        self.write({'event': SUBMITTED, 'job_id': job.job_id, 'identity': identity, 'job': b64encode(dumps(job, protocol=HIGHEST_PROTOCOL)).decode()})
+
+    # the result is on disk before the record that points at it
+    def completed(self, job, result):
+        record = {'event': COMPLETED, 'job_id': job.job_id, 'identity': self.identities.get(job.job_id), 'key': b64encode(dumps(job.result_key)).decode(), 'path': None}
+        if not isinstance(result, Exception):
+            path = self.done.get(record['identity'])
+            if path is None:
+                path = self.results_folder.joinpath(job.job_id).with_suffix('.pickle')
+                partial = path.with_suffix('.partial')
+                partial.write_bytes(dumps(result.attach() if isinstance(result, SharedFrame) else result, protocol=HIGHEST_PROTOCOL))
+                partial.replace(path)
+            record['path'] = str(path)
+            self.done[record['identity']] = record['path']
+            self.paths[job.job_id] = record['path']
+        self.write(record)
+
+    # a process crash loses nothing written before the flush
+    def flush(self):
+        self.file.flush()
+
+    def result(self, path: str):
+        return SharedFrame.share(loads(Path(path).read_bytes()))
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.results_folder = self.path.with_name(self.path.stem + '_results')
+        self.results_folder.mkdir(parents=True, exist_ok=True)
+        self.identities = {}  # job id -> identity
+        self.done = {}  # identity -> result path, of the jobs that completed without error
+        self.paths = {}  # job id -> result path
+        self.keys = {}  # job id -> result key, of the completed jobs of earlier runs
+        for record in JobJournal.read(self.path):
+            if record['identity'] is not None:
+                self.identities[record['job_id']] = record['identity']
+            if record['event'] == COMPLETED and record['path'] is not None and Path(record['path']).exists():
+                self.done[record['identity']] = record['path']
+                self.paths[record['job_id']] = record['path']
+                self.keys[record['job_id']] = loads(b64decode(record['key']))
+        self.file = open(self.path, 'a')
@@ -1,64 +1,841 @@
 from tt_singleton.singleton import Singleton
 from tt_semaphore import simple_semaphore as semaphore
-from multiprocessing import Manager, Pool, cpu_count, Process, JoinableQueue
-from time import sleep
+from tt_job_manager.shared_frame import SharedFrame
+from tt_job_manager.job_trace import JobTrace, payload_size
+from tt_job_manager.job_history import JobHistory, MEMORY
+from tt_job_manager.job_memory import MemorySampler, total_memory
+from tt_job_manager.job_coordinator import Coordinator
+from tt_job_manager.job_journal import JobJournal
+from tt_job_manager.job_cache import JobCache
+from tt_job_manager.job_authkey import authkey
+from tt_job_manager.job_executor import LocalExecutor, Forget, THREAD, PROCESS, AUTO
+from tt_os_abstraction.os_abstraction import env
+from multiprocessing import Manager, Pool, cpu_count, Process, JoinableQueue, Queue as ProcessQueue, resource_tracker
+from multiprocessing.managers import BaseManager, DictProxy
+from importlib import import_module
+from collections import deque
+from types import SimpleNamespace
+from weakref import WeakValueDictionary, finalize
+from heapq import heappush, heappop
+from itertools import count
+from functools import partial
+from queue import Empty
+from threading import RLock, Condition, Event, Thread, Timer, get_native_id
+from uuid import uuid4
+from time import monotonic, time
+from os import getpid, kill
+from signal import SIGTERM
+from pathlib import Path
+import json
+
+POOL = 'pool'
+IO = 'io'
+REMOTE = 'remote'
+STARTS = None  # queue of job starts read by the queue manager, set in its workers and threads
 
 class JobManager(metaclass=Singleton):
 
+    auto_size = 32  # jobs held by the auto backend before it starts the process pool for them
+    auto_delay = 0.1  # seconds the auto backend holds the first jobs before running fewer than auto_size on threads
+    listen_interval = 1.0  # most seconds a wait for completions lasts before it is made again
+
     @property
     def queue(self):
         return self._queue
 
-    def submit_job(self, job):
-        self._queue.put(job)
-        return job.result_key
+    # jobs submitted with the same batch key are run together as one pool task
+    # ready jobs start by priority, then longest expected running time first
+    # the result of a job others depend on is freed once they have finished, unless its future is held, or kept until collected
+    def submit_job(self, job, batch_key=None, priority=None, keep=False):
+        if batch_key is not None:
+            job.batch_key = batch_key
+        if priority is not None:
+            job.priority = priority
+        job.run_id = self._run_id
+        future = JobFuture(job, self)
+        with self._completion:  # registered before the job is queued, so its completion cannot be missed
+            self._futures[job.job_id] = future
+            self._latest_futures[job.result_key] = future
+            self._latest_ids[job.result_key] = job.job_id
+            if keep:
+                self._kept[job.job_id] = future
+        job.trace['submit'] = time()
+        if self._held is None or not self.hold(job):
+            self._queue.put(job)
+        return future
+
+    # the auto backend holds the first jobs submitted and picks a backend by how many there are, once for the whole run,
+    # later jobs depend on the results of earlier ones, so they stay on the backend that holds them however many there are
+    def hold(self, job):
+        with self._holding:
+            if self._held is None:
+                return False
+            self._held.append(job)
+            if len(self._held) == 1:
+                timer = Timer(JobManager.auto_delay, self.choose_backend)
+                timer.daemon = True
+                timer.start()
+            if len(self._held) >= JobManager.auto_size:
+                self.choose_backend()
+            return True
+
+    def choose_backend(self):
+        with self._holding:
+            if self._held is None:
+                return
+            self.start_backend(PROCESS if len(self._held) >= JobManager.auto_size else THREAD)
+            for job in self._held:
+                self._queue.put(job)
+            self._held = None
+
+    # yields futures as their jobs finish, result keys stand for the latest job submitted with them
+    def as_completed(self, keys, timeout=None):
+        self.choose_backend()
+        pending = [self.future(key) for key in keys]
+        deadline = None if timeout is None else monotonic() + timeout
+        while pending:
+            with self._completion:
+                finished = [future for future in pending if future.done()]
+                while not finished:
+                    remaining = None if deadline is None else deadline - monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f'{len(pending)} jobs not finished after {timeout}s')
+                    self._completion.wait(remaining)
+                    finished = [future for future in pending if future.done()]
+            for future in finished:
+                pending.remove(future)
+                yield future
+
+    # the future of the latest job submitted with a result key, the manager holds futures only until their jobs finish,
+    # so once the submitter has let go of it a finished one stands in
+    def future(self, key):
+        if isinstance(key, JobFuture):
+            return key
+        with self._completion:
+            future = self._latest_futures.get(key)
+            if future is None:
+                future = JobFuture(SimpleNamespace(result_key=key, job_id=self._latest_ids[key]), self)
+                future.event.set()
+            return future
+
+    # jobs a journaled run submitted but did not finish before it died, submitted again,
+    # a run that submits its whole pipeline again instead has the finished jobs served from the journal
+    def resume(self):
+        return [self.submit_job(job) for job in JobJournal.pending(self.journal_path)] if self.journal_path is not None else []
+
+    # completions from the queue manager wake the futures waiting on them
+    # the wait is bounded so a run that has exited does not leave a get pending on a job server
+    def listen(self):
+        while True:
+            try:
+                job_ids = self._completed.get(timeout=JobManager.listen_interval)
+            except Empty:
+                continue
+            except (EOFError, OSError):  # the manager has shut down
+                return
+            self.complete(job_ids)
+            self.forget()
+
+    def complete(self, job_ids):
+        with self._completion:
+            for job_id in job_ids:
+                future = self._futures.pop(job_id, None)
+                if future is not None:
+                    future.event.set()
+            self._completion.notify_all()
+
+    # futures are let go of on whatever thread collects them, the listener tells the queue manager,
+    # which frees the results of jobs that had dependants once those have finished
+    def forget(self):
+        job_ids = []
+        while self._forgotten:
+            job_ids.append(self._forgotten.popleft())
+        if job_ids:
+            self._queue.put(Forget(job_ids))
 
+    # a future collects the result of its own job, a result key the result of the latest job submitted with it
     def get_result(self, key):
-        return self._results_key_dict.pop(key)
+        self.choose_backend()
+        job_id = key.job_id if isinstance(key, JobFuture) else self._latest_ids[key]
+        result = self._results_dict[job_id]
+        kept = self._kept.pop(job_id, None)  # let go of once the result is out of the results dict, so it is not freed under it
+        if isinstance(result, SharedFrame):
+            frame = result.attach()  # attach before the pop, the queue manager may free the segment once the job id is gone
+            self._results_dict.pop(job_id)
+            if result.name not in self._retained:
+                result.unlink()
+            return frame
+        return self._results_dict.pop(job_id)
 
+    # the futures of the last jobs are let go of after the queue has emptied, they are forgotten before wait returns
     def wait(self):
+        self.choose_backend()
         self._queue.join()
+        with self._completion:
+            self._completion.wait_for(lambda: not self._futures, JobManager.listen_interval)
+        self.forget()
+        self._queue.join()
+
+    # chrome://tracing or https://ui.perfetto.dev timeline of every job traced so far
+    def write_trace(self, path: Path):
+        with open(path, 'w') as trace_file:
+            json.dump(JobTrace.chrome_trace(JobTrace.read(self.trace_path)), trace_file)
+        return path
+
+    # p50, p95 and max of each job phase and payload size per job class
+    def write_trace_summary(self, path: Path):
+        return JobTrace.summary(JobTrace.read(self.trace_path)).write(path)
 
     @staticmethod
     def stop_queue():
         semaphore.off('QueueManager')
 
-    def __init__(self, pool_size=cpu_count()):
-        print(f'\nStarting multiprocess job manager')
-        self._manager = Manager()
-        self._queue = JoinableQueue()
-        self._results_key_dict = self._manager.dict()
-        self.qm = WaitForProcess(target=QueueManager, name='QueueManager', args=(self._queue, self._results_key_dict, pool_size,))
-        self.qm.start()
+    def attach(self, address):
+        server = JobServer(address=address, authkey=authkey(address))
+        try:
+            server.connect()
+        except ConnectionRefusedError:
+            print(f'No job server at {address[0]}:{address[1]}')
+            return False
+        print(f'\nAttached to job server at {address[0]}:{address[1]}')
+        self._manager = server
+        self._queue = server.get_queue()
+        self._results_dict = server.get_results()
+        self._retained = server.get_retained()
+        self._completed = server.get_completed(self._run_id)
+        return True
+
+    # preload names modules imported by every worker before its first job
+    # address attaches to a long-lived server (python -m tt_job_manager.job_server) if one is running
+    # memory_budget is the bytes the pool's workers may use together, by default most of the machine's memory
+    # agents_address has the queue manager also hand tasks to agents (python -m tt_job_manager.job_agent) on other hosts,
+    # their input files are shipped with the jobs unless ship_files is off and the agents map the paths themselves
+    # journal_path keeps a journal of submissions and results, see resume
+    # backend runs the jobs inline, on threads or in the process pool, auto picks threads for a first burst smaller than auto_size,
+    # it is for runs whose first burst is the run, a pipeline whose first stage is a few io jobs keeps the process pool
+    def __init__(self, pool_size=cpu_count(), batch_size=100, batch_time=0.05, trace_path: Path = None, io_pool_size=16, preload: list = None, address: tuple = None,
+                 memory_budget: int = None, agents_address: tuple = None, ship_files=True, journal_path: Path = None, backend=PROCESS):
+        self.trace_path = trace_path if trace_path is not None else Path(env('temp')).joinpath('job_trace.jsonl')
+        self.journal_path = journal_path
+        self._run_id = uuid4().hex  # completions of this run's jobs come back on a queue of its own
+        self._completion = Condition()
+        self._futures = {}  # job id -> future, until the job finishes
+        self._latest_futures = WeakValueDictionary()  # result key -> future of the latest job submitted with it, while it is held
+        self._latest_ids = {}  # result key -> id of the latest job submitted with it
+        self._kept = {}  # job id -> future held for a job submitted with keep, until its result is collected
+        self._forgotten = deque()  # ids of finished jobs whose futures were let go of, for the queue manager
+        self._holding = RLock()
+        self._held = None  # jobs submitted before the auto backend has chosen
+        self._pool_size, self._io_pool_size = pool_size, io_pool_size
+        self._batching = (batch_size, batch_time)
+        self._pool_settings = (preload, memory_budget, agents_address, ship_files)
+        if address is not None and self.attach(address):
+            Thread(target=self.listen, daemon=True).start()
+            return
+        if backend == AUTO:
+            self._held = []
+        else:
+            self.start_backend(backend)
+
+    def start_backend(self, backend):
+        if backend == PROCESS:
+            print(f'\nStarting multiprocess job manager')
+            if SharedFrame.enabled:
+                resource_tracker.ensure_running()  # one tracker for every process, so shared results outlive the worker that made them
+            self._manager = Manager()
+            self._queue = JoinableQueue()
+            self._results_dict = self._manager.dict()
+            self._retained = self._manager.dict()
+            self._completed = self._manager.Queue()
+            preload, memory_budget, agents_address, ship_files = self._pool_settings
+            self.qm = WaitForProcess(target=QueueManager, name='QueueManager', args=(self._queue, self._results_dict, self._retained, self._pool_size, *self._batching, self.trace_path, self._io_pool_size,
+                                                                                     preload, memory_budget, {self._run_id: self._completed}, agents_address, ship_files, self.journal_path,))
+            self.qm.start()
+        else:
+            print(f'\nStarting {backend} job manager')
+            self._queue = LocalExecutor(max(self._pool_size, self._io_pool_size) if backend == THREAD else 0, self.trace_path)
+            self._results_dict = self._queue.results_dict
+            self._retained = {}
+            self._completed = self._queue.completed
+        Thread(target=self.listen, daemon=True).start()
+
+class JobFuture:
+    # returned by submit_job, equal to and hashed like the job's result key so it can stand in for the key
+    # result() raises the job's error where get_result returns it
+
+    def done(self):
+        return self.event.is_set()
+
+    def result(self, timeout=None):
+        if not self.collected:
+            if not self.event.wait(timeout):
+                raise TimeoutError(f'{self.key} not finished after {timeout}s')
+            self.value = self.manager.get_result(self)
+            self.collected = True
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return self.key == (other.key if isinstance(other, JobFuture) else other)
+
+    def __repr__(self):
+        return f'JobFuture({self.key!r}, {"done" if self.done() else "pending"})'
+
+    def __init__(self, job, manager):
+        self.key = job.result_key
+        self.job_id = job.job_id
+        self.manager = manager
+        self.event = Event()
+        self.collected = False
+        self.value = None
+        finalize(self, manager._forgotten.append, self.job_id).atexit = False
+
+class JobServer(BaseManager):  # client side of the long-lived server in job_server
+    address = ('localhost', 50500)
+
+JobServer.register('get_queue')
+JobServer.register('get_results', proxytype=DictProxy)
+JobServer.register('get_retained', proxytype=DictProxy)
+JobServer.register('get_completed')
 
 class QueueManager:
 
-    def __init__(self, q, results_dict, size):
-        print(f'+     queue manager (Pool size = {size})\n', flush=True)
+    drain_limit = 1000  # most jobs taken from the queue before the ready ones are started
+    memory_fraction = 0.8  # of the machine's memory, the budget when none is given
+    prefetch = 1  # tasks queued in the pool per worker, so a worker never waits on the round trip back here for its next one
+    watch_interval = 0.1  # seconds between checks of the running tasks against their timeouts
+    straggler_factor = 2  # times the p95 seconds of its class a job runs before a duplicate of it is started
+
+    def dispatch(self, job, upstream_results: list):
+        job.trace['dispatch'] = time()
+        if self.journal is not None and (path := self.journal.done.get(self.journal.identities[job.job_id])) is not None:
+            return self.replay(job, path)
+        job.upstream_results = upstream_results
+        job.trace['argument_size'] = payload_size([job.execute_function_arguments, job.execute_function_keyword_arguments, upstream_results])
+        if job.batch_key is None:
+            self.schedule([job])
+        else:
+            batch = self.batches.setdefault(job.batch_key, [])
+            if not batch:
+                self.batch_deadlines[job.batch_key] = monotonic() + self.batch_time
+            batch.append(job)
+            if len(batch) >= self.batch_size:
+                self.flush(job.batch_key)
+
+    # a job that finished in an earlier run is completed with the result it left there
+    def replay(self, job, path):
+        result = self.journal.result(path)
+        self.run_callback(job, True, result)
+        self.store([(job, result)])
+
+    # a batch is split evenly over the workers, so a burst smaller than batch_size is not left to one of them
+    def flush(self, batch_key):
+        jobs = self.batches.pop(batch_key)
+        del self.batch_deadlines[batch_key]
+        size = -(-len(jobs) // max(self.workers(jobs[0].io_bound), 1))
+        for first in range(0, len(jobs), size):
+            self.schedule(jobs[first:first + size])
+
+    def workers(self, io_bound):
+        return self.slots[IO] if io_bound else self.pool_size + self.agent_processes
+
+    # a worker is idle when nothing is ready for it and fewer tasks are running than there are workers
+    def idle(self, io_bound):
+        running = self.running[IO] if io_bound else self.running[POOL] + self.running[REMOTE]
+        return not self.ready[io_bound] and running < self.workers(io_bound)
+
+    def schedule(self, jobs: list):
+        for job in jobs:
+            job.trace['expected'] = self.history.expected(job)
+        expected = sum(job.trace['expected'] for job in jobs)
+        priority = max(job.priority for job in jobs)
+        heappush(self.ready[jobs[0].io_bound], (-priority, -expected, next(self.sequence), jobs))
+
+    # the jobs of a batch run one after another, so a batch needs as much as its largest job
+    def memory_estimate(self, jobs: list):
+        return max(job.memory if job.memory is not None else self.history.expected(job, MEMORY) for job in jobs)
+
+    # a task is admitted to the process pool while the workers' last resident memory and the estimates of the tasks
+    # admitted since stay under the budget, the first task is always admitted so one that is too large still runs
+    def admit(self, jobs: list):
+        if self.memory_budget is None or not self.reserved:
+            return True
+        return sum(self.worker_rss.values()) + sum(self.reserved.values()) + self.memory_estimate(jobs) <= self.memory_budget
+
+    # io bound jobs run on threads of the queue manager so network waits do not hold process pool slots,
+    # the others run in the local pool while it has room and then on the agents
+    def target(self, jobs: list):
+        if jobs[0].io_bound:
+            return IO if self.running[IO] < self.slots[IO] else None
+        if self.running[POOL] < self.slots[POOL] and self.admit(jobs):
+            return POOL
+        return REMOTE if self.running[REMOTE] < self.slots[REMOTE] else None
+
+    # tasks are held here until a worker is free, so the pool's own fifo never decides the order
+    def start_ready(self):
+        with self.lock:
+            for io_bound in [False, True]:
+                while self.ready[io_bound] and (target := self.target(self.ready[io_bound][0][3])) is not None:
+                    _, expected, _, jobs = heappop(self.ready[io_bound])
+                    if self.span_start is None:
+                        self.span_start = monotonic()
+                    self.span_tasks[io_bound].append(-expected)
+                    self.start(target, jobs)
+
+    # every start of a task's jobs is a task of its own, a duplicate started for a straggler runs the same jobs
+    # workers report when each job of a task starts only if one of them can time out or be duplicated,
+    # an io task runs on a thread of its own, timed from when it is handed over, so a thread given up on holds back nothing
+    def start(self, target, jobs: list):
+        task_id = next(self.task_ids)
+        self.running[target] += 1
+        self.placed[task_id] = (target, jobs)
+        self.attempts.setdefault(jobs[0].job_id, []).append(task_id)
+        watched = any(job.timeout is not None or job.speculate for job in jobs)
+        if target == POOL:
+            self.reserved[task_id] = self.memory_estimate(jobs)
+        if target == REMOTE:
+            if watched:  # agents do not report their jobs, the task is timed as a whole from when it is sent
+                self.started[task_id] = (None, time(), None)
+            self.coordinator.send(task_id, jobs)
+        elif target == IO:
+            if watched:
+                self.started[task_id] = (None, time(), 0)
+            Thread(target=self.run_io, args=(task_id, jobs, watched), daemon=True).start()
+        else:
+            self.pool.apply_async(execute_batch, (jobs, task_id if watched else None), callback=partial(self.batch_complete, task_id), error_callback=partial(self.batch_failed, task_id))
+
+    # a daemon thread, one that never returns does not hold up the queue manager's exit
+    def run_io(self, task_id, jobs: list, watched):
+        try:
+            outcomes = execute_batch(jobs, task_id if watched else None)
+        except Exception as e:
+            return self.batch_failed(task_id, e)
+        self.batch_complete(task_id, outcomes)
+
+    def release_slot(self, task_id, target):
+        self.running[target] -= 1
+        self.reserved.pop(task_id, None)
+        return self.started.pop(task_id, None)
+
+    # the first outcome of a task's jobs wins, the other tasks running them are stopped and their outcomes dropped
+    def settle(self, task_id):
+        with self.lock:
+            if task_id not in self.placed:
+                return None
+            target, jobs = self.placed.pop(task_id)
+            self.release_slot(task_id, target)
+            for other in self.attempts.pop(jobs[0].job_id):
+                if other != task_id:
+                    self.cancel(other)
+            return jobs
+
+    # a pool worker running the task is replaced, a thread or an agent is left to finish it unheard
+    def cancel(self, task_id):
+        target, jobs = self.placed.pop(task_id)
+        started = self.release_slot(task_id, target)
+        if target == POOL and started is not None:
+            self.replace_worker(started[0])
+
+    # the pool starts a new worker in place of one that is killed, a kill that lands while the worker holds
+    # one of the pool's queue locks would stall the pool, so workers are only killed in the middle of a job
+    def replace_worker(self, pid):
+        try:
+            kill(pid, SIGTERM)
+        except OSError:  # it has already gone
+            pass
+        self.worker_rss.pop(pid, None)
+
+    def task_started(self, task_id, pid, start, index):
+        with self.lock:
+            if task_id not in self.placed:
+                return
+            if index == len(self.placed[task_id][1]):  # all its jobs have run, it is no longer timed
+                self.started.pop(task_id, None)
+            else:
+                self.started[task_id] = (pid, start, index)
+
+    # seconds the running part of a task may take, the job running in a local worker or all the jobs sent to an agent
+    @staticmethod
+    def time_limit(jobs: list, index):
+        timeouts = [job.timeout for job in (jobs if index is None else jobs[index:index + 1])]
+        return None if None in timeouts else sum(timeouts)
+
+    def check_running(self):
+        with self.lock:
+            now = time()
+            for task_id, (pid, start, index) in list(self.started.items()):
+                if task_id not in self.placed:
+                    continue
+                target, jobs = self.placed[task_id]
+                limit = self.time_limit(jobs, index)
+                if limit is not None and now - start > limit:
+                    self.timed_out(task_id, index, limit)
+                elif self.straggling(jobs, now - start):
+                    self.duplicate(jobs)
+
+    # a single job well past the p95 of its class is started again on a free worker, unless other tasks wait for one
+    def straggling(self, jobs: list, seconds):
+        if len(jobs) > 1 or not jobs[0].speculate or len(self.attempts[jobs[0].job_id]) > 1 or self.ready[jobs[0].io_bound]:
+            return False
+        p95 = self.history.percentile(jobs[0], 95)
+        return p95 is not None and seconds > p95 * QueueManager.straggler_factor
+
+    def duplicate(self, jobs: list):
+        target = self.target(jobs)
+        if target is not None:
+            print(f'      {jobs[0].job_name} is straggling, started again', flush=True)
+            self.start(target, jobs)
+
+    # the job that ran too long fails, the others of its task are scheduled again since their outcomes went with the worker
+    def timed_out(self, task_id, index, limit):
+        target, jobs = self.placed[task_id]
+        attempts = self.attempts[jobs[0].job_id]
+        if len(attempts) > 1:  # a duplicate is still running them
+            attempts.remove(task_id)
+            return self.cancel(task_id)
+        pid = self.started[task_id][0]
+        self.settle(task_id)
+        if target == POOL:
+            self.replace_worker(pid)
+        failed = jobs if index is None else [jobs[index]]
+        outcomes = [(job, TimeoutError(f'{job.job_name} still running after {limit}s')) for job in failed]
+        for job, error in outcomes:
+            self.run_callback(job, False, error)
+        self.store(outcomes)
+        if index is not None and len(jobs) > 1:
+            self.schedule(jobs[:index] + jobs[index + 1:])
+        self.task_done()
+
+    # the queue manager's watchdog, reading job starts from the workers and checking running tasks against them
+    def watch(self):
+        while True:
+            deadline = monotonic() + QueueManager.watch_interval
+            try:
+                while (remaining := deadline - monotonic()) > 0:
+                    self.task_started(*self.starts.get(timeout=remaining))
+            except Empty:
+                pass
+            except OSError:  # the queue manager is exiting, a thread still running an io job keeps it a moment longer
+                return
+            self.check_running()
+
+    def agent_joined(self, processes):
+        with self.lock:
+            self.agent_processes += processes
+            self.slots[REMOTE] += processes * (1 + QueueManager.prefetch)
+            print(f'+     agent with {processes} processes', flush=True)
+            self.start_ready()
+
+    # tasks a leaving agent had not finished, and those left for agents when none remain, are scheduled again
+    def agent_left(self, processes, unfinished: list):
+        with self.lock:
+            self.agent_processes -= processes
+            self.slots[REMOTE] -= processes * (1 + QueueManager.prefetch)
+            print(f'-     agent with {processes} processes, {len(unfinished)} tasks returned', flush=True)
+            if not self.agent_processes:
+                unfinished += self.coordinator.unsent()
+            for task_id in unfinished:
+                if task_id not in self.placed:  # it timed out, or a duplicate finished first
+                    continue
+                target, jobs = self.placed.pop(task_id)
+                self.release_slot(task_id, target)
+                attempts = self.attempts[jobs[0].job_id]
+                attempts.remove(task_id)
+                if not attempts:
+                    del self.attempts[jobs[0].job_id]
+                    self.schedule(jobs)
+            self.start_ready()
+
+    # once every started task is done, the lpt makespan of their expected times is reported next to the actual one
+    def task_done(self):
+        with self.lock:
+            self.flush_due()
+            self.start_ready()
+            if self.span_start is None or any(self.running.values()) or any(self.ready.values()) or self.batches:
+                return
+            predicted = max(JobHistory.makespan(self.span_tasks[False], self.pool_size + self.agent_processes), JobHistory.makespan(self.span_tasks[True], self.slots[IO]))
+            tasks = sum(len(tasks) for tasks in self.span_tasks.values())
+            print(f'      makespan {monotonic() - self.span_start:.3f}s, predicted {predicted:.3f}s ({tasks} tasks)', flush=True)
+            self.span_start = None
+            self.span_tasks = {False: [], True: []}
+            self.history.save()
+
+    # partial batches are started once their oldest job has waited batch_time seconds, or at once while a worker is idle,
+    # waiting for more jobs only pays off while every worker is busy
+    def flush_due(self):
+        with self.lock:
+            now = monotonic()
+            for batch_key in [key for key, deadline in self.batch_deadlines.items() if deadline <= now or self.idle(self.batches[key][0].io_bound)]:
+                self.flush(batch_key)
+
+    # with no partial batch waiting the queue manager sleeps until a job is submitted or it is stopped
+    def next_timeout(self):
+        with self.lock:
+            if not self.batch_deadlines:
+                return None
+            return max(0.0, min(self.batch_deadlines.values()) - monotonic())
+
+    # stop_queue turns the semaphore off, which wakes this and ends the main loop behind the jobs already submitted
+    def stop_when_off(self):
+        semaphore.wait(self.__class__.__name__, False)
+        self.q.put(None)
+
+    def job_submitted(self, job):
+        if job is None:
+            self.stopping = True
+            return self.q.task_done()
+        if isinstance(job, Forget):
+            with self.lock:
+                self.forget(job.job_ids)
+            return self.q.task_done()
+        with self.lock:
+            upstream_ids = []
+            for dependency in job.dependencies:  # a dependency is an upstream job id or the result key of the latest job submitted with it
+                upstream_id = dependency if dependency in self.job_keys else self.latest.get(dependency)
+                if upstream_id is None:
+                    return self.job_failed(job, KeyError(f'no job submitted for dependency {dependency}'))
+                # an upstream that finished before this job arrived is taken from the results dict, or the journal
+                if upstream_id in self.finished and upstream_id not in self.results and upstream_id not in self.results_dict and not self.journaled(upstream_id):
+                    return self.job_failed(job, KeyError(f'result {self.job_keys[upstream_id]} was collected before {job.job_name} was submitted'))
+                upstream_ids.append(upstream_id)
+            if self.journal is not None:
+                self.journal.submitted(job, JobJournal.identity(job, [self.journal.identities.get(upstream_id) for upstream_id in upstream_ids]))
+            self.job_keys[job.job_id] = job.result_key
+            self.latest[job.result_key] = job.job_id
+            self.upstream[job.job_id] = upstream_ids
+
+            for upstream_id in upstream_ids:
+                self.dependants[upstream_id] = self.dependants.get(upstream_id, 0) + 1
+                self.depended.add(upstream_id)
+                if upstream_id not in self.finished:
+                    blocked = self.blocked.setdefault(upstream_id, [])
+                    if job not in blocked:
+                        blocked.append(job)
+                elif upstream_id not in self.results:
+                    self.retain(upstream_id, self.results_dict[upstream_id] if upstream_id in self.results_dict else self.journal.result(self.journal.paths[upstream_id]))
+            self.release_if_ready(job)
+
+    def journaled(self, job_id):
+        return self.journal is not None and job_id in self.journal.paths
+
+    def release_if_ready(self, job):
+        upstream_ids = self.upstream[job.job_id]
+        if any(upstream_id not in self.finished for upstream_id in upstream_ids):
+            return
+        upstream_results = [self.results[upstream_id] for upstream_id in upstream_ids]
+        errors = [result for result in upstream_results if isinstance(result, Exception)]
+        if errors:
+            self.job_failed(job, errors[0])
+        else:
+            self.dispatch(job, upstream_results)
+
+    def retain(self, job_id, result):
+        self.results[job_id] = result
+        if isinstance(result, SharedFrame):
+            self.retained[result.name] = True
+
+    # an upstream result is kept until its last dependant finishes, its segment is freed once it has been collected,
+    # or its future let go of
+    def release(self, job_id):
+        del self.dependants[job_id]
+        result = self.results.pop(job_id)
+        if isinstance(result, SharedFrame):
+            self.retained.pop(result.name, None)
+            if job_id not in self.results_dict:
+                result.unlink()
+        if job_id in self.unheld:
+            self.drop(job_id)
+
+    # a result other jobs depended on is dropped once they have finished and the submitter has let go of its future,
+    # one no job depended on is kept for get_result by its key
+    def forget(self, job_ids: list):
+        for job_id in job_ids:
+            if job_id not in self.depended:
+                continue
+            if self.dependants.get(job_id, 0):
+                self.unheld.add(job_id)
+            else:
+                self.drop(job_id)
+
+    def drop(self, job_id):
+        self.unheld.discard(job_id)
+        result = self.results_dict.pop(job_id, None)
+        if isinstance(result, SharedFrame):
+            result.unlink()
+
+    # results of a batch are written to the results dict in one round trip to the manager
+    def store(self, outcomes: list):
+        with self.lock:
+            for job, result in outcomes:
+                self.trace.record(job, result)
+                if self.journal is not None:
+                    self.journal.completed(job, result)
+                if not isinstance(result, Exception):
+                    self.history.learn(job)
+                if not job.io_bound and 'host' not in job.trace and job.trace.get('rss') is not None:  # local workers only
+                    self.worker_rss[job.trace['pid']] = job.trace['rss']
+                self.finished.add(job.job_id)
+                if self.dependants.get(job.job_id, 0):
+                    self.retain(job.job_id, result)
+            self.results_dict.update({job.job_id: result for job, result in outcomes})
+            if self.completed is not None:
+                runs = {}
+                for job, result in outcomes:
+                    runs.setdefault(job.run_id, []).append(job.job_id)
+                for run_id, job_ids in runs.items():
+                    if (completed := self.completed.get(run_id)) is not None:  # none for jobs queued without a job manager
+                        completed.put(job_ids)
+
+            for job, result in outcomes:
+                for upstream_id in self.upstream.pop(job.job_id, []):
+                    self.dependants[upstream_id] -= 1
+                    if not self.dependants[upstream_id]:
+                        self.release(upstream_id)
+                for dependant in self.blocked.pop(job.job_id, []):
+                    self.release_if_ready(dependant)
+            self.trace.flush()
+            if self.journal is not None:
+                self.journal.flush()
+        for _ in outcomes:
+            self.q.task_done()
+
+    @staticmethod
+    def run_callback(job, success, result):
+        if success:
+            try:
+                job.execute_callback(result.attach() if isinstance(result, SharedFrame) else result)
+            except Exception as e:
+                job.error_callback(e)
+        else:
+            job.error_callback(result)
+        job.trace['callback'] = time()
+
+    def job_failed(self, job, error):
+        self.run_callback(job, False, error)
+        self.store([(job, error)])
+
+    # pool callbacks run on the pool's result handler thread, so completions are delivered as they happen
+    def batch_complete(self, task_id, outcomes):
+        jobs = self.settle(task_id)
+        if jobs is None:  # the jobs were settled by another task, its shared results are not needed
+            for success, result, trace in outcomes:
+                if isinstance(result, SharedFrame):
+                    result.unlink()
+            return
+        for job, (success, result, trace) in zip(jobs, outcomes):
+            job.trace |= trace
+            self.run_callback(job, success, result)
+        self.store([(job, result) for job, (success, result, trace) in zip(jobs, outcomes)])
+        self.task_done()
+
+    def batch_failed(self, task_id, error):
+        jobs = self.settle(task_id)
+        if jobs is None:
+            return
+        for job in jobs:
+            self.run_callback(job, False, error)
+        self.store([(job, error) for job in jobs])
+        self.task_done()
+
+    def __init__(self, q, results_dict, retained, size, batch_size, batch_time, trace_path, io_size, preload=None, memory_budget=None, completed=None, agents_address=None, ship_files=True, journal_path=None):
+        print(f'+     queue manager (Pool size = {size}, io threads = {io_size})\n', flush=True)
         semaphore.on(self.__class__.__name__)
-        job_key_dict = {}
-        with Pool(size) as p:
-            while semaphore.is_on(self.__class__.__name__):  # pull submitted jobs and start them in the pool
-                while not q.empty():
-                    job = q.get()  # retrieve the job, launch the job
-                    job_key_dict[job.result_key] = p.apply_async(job.execute, callback=job.execute_callback, error_callback=job.error_callback)
-
-                # check results for complete job and put them on external lookup
-                for key in list(job_key_dict.keys()):
-                    if job_key_dict[key].ready():  # job is complete, but not necessarily successful
-                        async_return = job_key_dict.pop(key)
-                        if async_return.successful():
-                            job_result = async_return.get()
-                            results_dict[key] = job_result
-                        else:
-                            try:
-                                async_return.get()
-                            except Exception as e:
-                                results_dict[key] = e
-                        q.task_done()
-                sleep(1)
+        self.q = q
+        self.results_dict = results_dict
+        self.retained = retained  # names of shared results still needed by dependants
+        self.completed = completed  # run id -> queue of the job ids of each stored batch, for the futures of the run that submitted them
+        self.lock = RLock()
+        self.stopping = False
+        self.job_keys = {}  # job id -> result key, for every submitted job
+        self.latest = {}  # result key -> id of the latest job submitted with that key
+        self.upstream = {}  # job id -> upstream job ids, until the job finishes
+        self.dependants = {}  # job id -> number of unfinished dependants
+        self.blocked = {}  # upstream job id -> dependants waiting for it
+        self.results = {}  # job id -> result, while dependants need it
+        self.depended = set()  # ids of the jobs that had dependants
+        self.unheld = set()  # ids of those whose futures were let go of while dependants still needed them
+        self.finished = set()
+        self.batch_size = batch_size
+        self.batch_time = batch_time
+        self.batches = {}  # batch key -> jobs waiting to be started together
+        self.batch_deadlines = {}  # batch key -> time the batch is started even if it is not full
+        self.trace = JobTrace(trace_path)
+        self.journal = JobJournal(journal_path) if journal_path is not None else None
+        if self.journal is not None:  # jobs finished in earlier runs can be the upstream of resumed ones
+            for job_id, key in self.journal.keys.items():
+                self.job_keys[job_id] = key
+                self.latest[key] = job_id
+                self.finished.add(job_id)
+        self.history = JobHistory(Path(trace_path).with_name('job_history.json'))
+        self.ready = {False: [], True: []}  # io bound -> heap of (-priority, -expected seconds, sequence, jobs)
+        self.running = {POOL: 0, IO: 0, REMOTE: 0}
+        self.pool_size = size
+        self.agent_processes = 0
+        self.slots = {POOL: size * (1 + QueueManager.prefetch), IO: io_size, REMOTE: 0}
+        self.task_ids = count()
+        self.placed = {}  # task id -> where it runs and its jobs, until it is settled
+        self.attempts = {}  # first job id of a task -> ids of the tasks running its jobs, more than one once duplicated
+        self.started = {}  # task id -> worker pid, start and index of the job it is running, for the tasks being timed
+        self.starts = ProcessQueue()  # task id, worker pid, start and job index from the workers
+        self.coordinator = None
+        self.sequence = count()
+        self.span_start = None  # start of the first task since the pool was last idle
+        self.span_tasks = {False: [], True: []}  # expected seconds of the tasks started since then
+        total = total_memory()
+        self.memory_budget = memory_budget if memory_budget is not None or total is None else int(total * QueueManager.memory_fraction)
+        self.worker_rss = {}  # worker pid -> resident bytes when its last job ended
+        self.reserved = {}  # task id of each task in the process pool -> its memory estimate
+        warm_worker(preload, self.starts)  # for the io threads
+        with Pool(size, initializer=warm_worker, initargs=(preload, self.starts)) as self.pool:
+            Thread(target=self.watch, daemon=True).start()
+            if agents_address is not None:
+                self.coordinator = Coordinator(agents_address, ship_files, self.agent_joined, self.agent_left, self.batch_complete, self.batch_failed)
+            Thread(target=self.stop_when_off, daemon=True).start()
+            while not self.stopping:  # block until a job is submitted and start it in the pool
+                try:
+                    self.job_submitted(q.get(timeout=self.next_timeout()))
+                    for _ in range(QueueManager.drain_limit):  # take what is already submitted so it is ordered together
+                        self.job_submitted(q.get_nowait())
+                except Empty:
+                    pass
+                self.flush_due()
+                self.start_ready()
+        self.history.save()
         print(f'-     queue manager\n', flush=True)
 
+def warm_worker(preload: list, starts=None):
+    global STARTS
+    STARTS = starts
+    for module in preload or []:
+        import_module(module)
+
+# a single job is run as a batch of one, the start of each job of a timed task is reported to the queue manager
+def execute_batch(jobs: list, task_id=None):
+    outcomes = []
+    sampler = MemorySampler.process()
+    for index, job in enumerate(jobs):
+        trace = {'pid': getpid(), 'tid': get_native_id(), 'start': time()}
+        if task_id is not None and STARTS is not None:
+            STARTS.put((task_id, trace['pid'], trace['start'], index))
+        if sampler is not None:
+            sampler.reset()
+        try:
+            result = job.execute()
+            trace |= {'end': time(), 'result_size': payload_size(result)}
+            outcomes.append((True, result, trace))
+        except Exception as e:
+            trace |= {'end': time()}
+            outcomes.append((False, e, trace))
+        if sampler is not None:
+            trace |= sampler.usage()
+    if task_id is not None and STARTS is not None:
+        STARTS.put((task_id, getpid(), time(), len(jobs)))
+    return outcomes
+
 class WaitForProcess(Process, metaclass=Singleton):
 
     def start(self, **kwargs):
@@ -67,15 +844,36 @@ class WaitForProcess(Process, metaclass=Singleton):
             semaphore.off(semaphore_file_name)
         # noinspection PyArgumentList
         super().start(**kwargs)
-        while not semaphore.is_on(semaphore_file_name):
-            sleep(0.1)
+        while not semaphore.wait(semaphore_file_name, True, semaphore.HEARTBEAT):
+            if not self.is_alive():
+                raise RuntimeError(f'{semaphore_file_name} exited before it was ready')
 
 class Job:
 
+    io_bound = False  # set by jobs that mostly wait on the network or disk
+    priority = 0  # higher starts first, ahead of the expected running time
+    cache_version = None  # set to cache results by content, change it whenever the code behind the job changes
+    memory = None  # bytes a job is declared to need, otherwise learned from the jobs of its class that ran before
+    timeout = None  # seconds a job may run before it fails with a TimeoutError, its pool worker is killed and replaced, an io job's thread is left to finish unheard
+    speculate = False  # set to start a duplicate of a job running far past the p95 of its class, the first to finish wins
+    share = True  # frames are returned in shared memory, turned off for jobs run in the submitting process
+    run_id = None  # set by submit_job, completions go to the job manager that submitted the job
+
     def execute(self):
-        # init_time = perf_counter()
         print(f'+     {self.job_name}', flush=True)
-        return self.execute_function(*self.execute_function_arguments, **self.execute_function_keyword_arguments)
+        upstream_results = [r.attach() if isinstance(r, SharedFrame) else r for r in self.upstream_results]
+        if self.cache_version is None:
+            return self.shared(JobCache.mark(self.execute_function(*upstream_results, *self.execute_function_arguments, **self.execute_function_keyword_arguments)))
+        cache = JobCache()
+        key = JobCache.key(self, upstream_results)
+        cached, result = cache.get(key)
+        if not cached:
+            result = self.execute_function(*upstream_results, *self.execute_function_arguments, **self.execute_function_keyword_arguments)
+            cache.put(key, result)
+        return self.shared(JobCache.mark(result, key))
+
+    def shared(self, result):
+        return SharedFrame.share(result) if self.share else result
 
     def execute_callback(self, result, message: str = None):
         if message is not None:
@@ -87,9 +885,15 @@ class Job:
     def error_callback(self, error):
         print(f'<!>   {self.job_name}, {error.__class__.__name__} {error}', flush=True)
 
-    def __init__(self, job_name, result_key, function, arguments, keyword_arguments):
+    # dependencies are result keys or upstream jobs, their results are passed to function ahead of arguments
+    def __init__(self, job_name, result_key, function, arguments, keyword_arguments, dependencies: list = None):
         self.job_name = job_name
+        self.job_id = uuid4().hex
         self.result_key = result_key
         self.execute_function = function
         self.execute_function_arguments = arguments
         self.execute_function_keyword_arguments = keyword_arguments
+        self.dependencies = [d.job_id if isinstance(d, (Job, JobFuture)) else d for d in dependencies] if dependencies else []
+        self.upstream_results = []
+        self.batch_key = None
+        self.trace = {}  # timestamps and payload sizes, see job_trace
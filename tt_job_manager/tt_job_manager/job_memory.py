@@ -0,0 +1,58 @@
+from threading import Thread
+from time import sleep
+import os
+
+try:
+    import psutil
+except ImportError:  # resident memory is read from /proc where there is one, otherwise memory is not tracked
+    psutil = None
+
+
+def rss():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, AttributeError, ValueError):
+        return None
+
+
+def total_memory():
+    if psutil is not None:
+        return psutil.virtual_memory().total
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class MemorySampler:
+    # peak resident memory of this process while a job runs, sampled on a background thread
+
+    interval = 0.02  # seconds between samples
+    sampler = None  # the running sampler of this process
+
+    @staticmethod
+    def process():
+        if MemorySampler.sampler is None and rss() is not None:
+            MemorySampler.sampler = MemorySampler()
+        return MemorySampler.sampler
+
+    def run(self):
+        while True:
+            self.peak = max(self.peak, rss())
+            sleep(MemorySampler.interval)
+
+    def reset(self):
+        self.start = self.peak = rss()
+
+    # memory is the job's own growth above the worker's resident memory when it started
+    def usage(self):
+        current = rss()
+        self.peak = max(self.peak, current)
+        return {'rss': current, 'memory_peak': self.peak, 'memory': self.peak - self.start}
+
+    def __init__(self):
+        self.start = self.peak = rss()
+        Thread(target=self.run, daemon=True).start()
@@ -0,0 +1,41 @@
+from multiprocessing import cpu_count, resource_tracker
+from multiprocessing.managers import DictProxy
+from queue import Queue
+from threading import Thread
+from pathlib import Path
+import sys
+
+from tt_os_abstraction.os_abstraction import env
+from tt_job_manager.shared_frame import SharedFrame
+from tt_job_manager.job_manager import JobServer, QueueManager
+from tt_job_manager.job_authkey import authkey
+
+
+# a queue manager that outlives the runs submitting to it, so its pool stays warm between them
+# attach with JobManager(address=JobServer.address), stop with JobManager.stop_queue()
+# serving on an address other than loopback needs TT_JOB_MANAGER_AUTHKEY set here and in the runs attaching, see job_authkey
+# each attached run reads the completions of its own jobs from a queue of its own, so runs can attach one after another or together
+def serve(address=JobServer.address, pool_size=cpu_count(), preload: list = None, batch_size=100, batch_time=0.05, io_pool_size=16, memory_budget: int = None, agents_address: tuple = None, ship_files=True):
+    queue, results, retained, completed = Queue(), {}, {}, {}  # completed is run id -> queue
+
+    class Server(JobServer):
+        pass
+
+    Server.register('get_queue', callable=lambda: queue)
+    Server.register('get_results', callable=lambda: results, proxytype=DictProxy)
+    Server.register('get_retained', callable=lambda: retained, proxytype=DictProxy)
+    Server.register('get_completed', callable=lambda run_id: completed.setdefault(run_id, Queue()))
+
+    if SharedFrame.enabled:
+        resource_tracker.ensure_running()
+    server = Server(address=address, authkey=authkey(address)).get_server()
+    Thread(target=server.serve_forever, daemon=True).start()
+    print(f'\nJob server listening on {address[0]}:{address[1]}', flush=True)
+    QueueManager(queue, results, retained, pool_size, batch_size, batch_time, Path(env('temp')).joinpath('job_trace.jsonl'), io_pool_size, preload, memory_budget, completed, agents_address, ship_files)
+
+
+if __name__ == '__main__':
+    # python -m tt_job_manager.job_server [port] [module to preload ...]
+    args = sys.argv[1:]
+    port = int(args[0]) if len(args) > 0 else JobServer.address[1]
+    serve((JobServer.address[0], port), preload=args[1:])
@@ -0,0 +1,87 @@
+from pathlib import Path
+from sys import getsizeof
+from os import getpid
+import json
+import numpy as np
+from pandas import DataFrame as PandasDataFrame
+
+from tt_dataframe.dataframe import DataFrame
+from tt_job_manager.shared_frame import SharedFrame
+
+PHASES = {'queued': ('submit', 'dispatch'), 'waiting': ('dispatch', 'start'), 'running': ('start', 'end'), 'transfer': ('end', 'callback')}
+STAMPS = ['submit', 'dispatch', 'start', 'end', 'callback']
+SIZES = ['argument_size', 'result_size', 'memory', 'memory_peak']
+EXPECTED = 'expected'  # running seconds the scheduler expected from the job history
+
+
+def payload_size(payload) -> int:
+    # estimate of the bytes a payload moves between processes, without pickling it
+    if isinstance(payload, SharedFrame):
+        return payload.size
+    if isinstance(payload, PandasDataFrame):
+        return int(payload.memory_usage(index=True).sum())
+    if isinstance(payload, np.ndarray):
+        return payload.nbytes
+    if isinstance(payload, (list, tuple, set)):
+        return sum(payload_size(p) for p in payload)
+    if isinstance(payload, dict):
+        return sum(payload_size(k) + payload_size(v) for k, v in payload.items())
+    return getsizeof(payload)
+
+
+class JobTrace:
+    # one json line per finished job: timestamps in seconds since the epoch, sizes in bytes
+
+    @staticmethod
+    def read(path: Path):
+        with open(path) as trace_file:
+            return [json.loads(line) for line in trace_file if line.strip()]
+
+    @staticmethod
+    def chrome_trace(records: list):
+        # running spans sit on their worker's track, the other phases are async spans on the queue manager's track
+        events = []
+        for index, record in enumerate(records):
+            arguments = {k: record[k] for k in ['result_key', 'status'] + SIZES}
+            for phase, (begin, end) in PHASES.items():
+                if record[begin] is None or record[end] is None:
+                    continue
+                if phase == 'running':
+                    events.append({'name': record['job_name'], 'cat': record['job_class'], 'ph': 'X', 'pid': record['pid'], 'tid': record['tid'],
+                                   'ts': record[begin] * 1e6, 'dur': (record[end] - record[begin]) * 1e6, 'args': arguments})
+                else:
+                    event = {'name': f'{phase} {record["job_name"]}', 'cat': record['job_class'], 'id': index, 'pid': record['manager_pid'], 'tid': record['manager_pid']}
+                    events.append(event | {'ph': 'b', 'ts': record[begin] * 1e6, 'args': arguments})
+                    events.append(event | {'ph': 'e', 'ts': record[end] * 1e6})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    @staticmethod
+    def summary(records: list):
+        rows = []
+        frame = PandasDataFrame(records)
+        frame[STAMPS + SIZES + [EXPECTED]] = frame[STAMPS + SIZES + [EXPECTED]].astype(float)  # stamps of phases a job never reached are None
+        for phase, (begin, end) in PHASES.items():
+            frame[phase] = frame[end] - frame[begin]
+        frame['total'] = frame['callback'] - frame['submit']
+        for job_class, group in frame.groupby('job_class'):
+            row = {'job_class': job_class, 'jobs': len(group), 'errors': int((group.status != 'ok').sum())}
+            for column in list(PHASES) + [EXPECTED, 'total'] + SIZES:
+                values = group[column].dropna().to_numpy(dtype=float)
+                p50, p95, maximum = (np.percentile(values, 50), np.percentile(values, 95), values.max()) if len(values) else (np.nan, np.nan, np.nan)
+                row |= {f'{column} p50': p50, f'{column} p95': p95, f'{column} max': maximum}
+            rows.append(row)
+        return DataFrame(rows)
+
+    def record(self, job, result):
+        trace = job.trace
+        record = {'job_name': job.job_name, 'job_class': type(job).__name__, 'result_key': str(job.result_key),
+                  'status': result.__class__.__name__ if isinstance(result, Exception) else 'ok', 'manager_pid': self.pid}
+        record |= {stamp: trace.get(stamp) for stamp in STAMPS + ['pid', 'tid', EXPECTED] + SIZES}
+        self.file.write(json.dumps(record) + '\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def __init__(self, path: Path):
+        self.pid = getpid()
+        self.file = open(path, 'w')
@@ -0,0 +1,85 @@
+from multiprocessing.shared_memory import SharedMemory
+from pickle import dumps, loads
+from os import name as os_name
+import numpy as np
+from pandas import DataFrame as PandasDataFrame, DatetimeTZDtype, RangeIndex, Index, Series
+from pandas.api.types import pandas_dtype
+
+from tt_dataframe.dataframe import DataFrame
+
+ARRAY = 'array'
+DATETIME_TZ = 'datetime tz'
+PICKLE = 'pickle'
+
+
+class SharedFrame:
+    # small picklable handle to a frame whose column buffers are stored in one shared memory segment
+
+    alignment = 64
+    # windows releases a segment as soon as its creator closes it, so results are pickled there as before
+    enabled = os_name == 'posix'
+
+    @staticmethod
+    def share(result):
+        return SharedFrame(result) if SharedFrame.enabled and isinstance(result, PandasDataFrame) else result
+
+    @staticmethod
+    def buffer(values):
+        dtype = values.dtype
+        if isinstance(dtype, DatetimeTZDtype):
+            return DATETIME_TZ, str(dtype), np.ascontiguousarray(values.array.asi8)
+        if isinstance(dtype, np.dtype) and dtype.kind in 'biufmM':
+            return ARRAY, dtype.str, np.ascontiguousarray(values.to_numpy())
+        return PICKLE, None, np.frombuffer(dumps(values.array), dtype=np.uint8)
+
+    @staticmethod
+    def values(buffer, kind, dtype, offset, length):
+        if kind == DATETIME_TZ:
+            return Series(np.ndarray(length, np.int64, buffer=buffer, offset=offset), dtype=pandas_dtype(dtype), copy=False).array
+        if kind == PICKLE:
+            return loads(np.ndarray(length, np.uint8, buffer=buffer, offset=offset))
+        return np.ndarray(length, np.dtype(dtype), buffer=buffer, offset=offset)
+
+    def unlink(self):
+        try:
+            SharedMemory(name=self.name).unlink()
+        except FileNotFoundError:
+            pass
+
+    def attach(self):
+        shm = SharedMemory(name=self.name)
+        buffer = shm.buf
+        shm._buf = shm._mmap = None  # the mapping now belongs to the column arrays and is released with the last of them
+        shm.close()
+
+        arrays = [self.values(buffer, *entry) for entry in self.entries]
+        index = RangeIndex(*self.index) if self.index is not None else Index(arrays.pop(), name=self.index_name, copy=False)
+        frame = DataFrame(dict(zip(range(len(self.columns)), arrays)), index=index, copy=False)
+        frame.columns = Index(self.columns, tupleize_cols=False)
+        frame.attrs.update(self.attrs)
+        return frame
+
+    def __init__(self, frame: PandasDataFrame):
+        self.columns = frame.columns.to_list()
+        self.attrs = dict(frame.attrs)
+        self.index_name = frame.index.name
+        self.index = None
+
+        buffers = [self.buffer(frame.iloc[:, i]) for i in range(frame.shape[1])]
+        if isinstance(frame.index, RangeIndex):
+            self.index = (frame.index.start, frame.index.stop, frame.index.step)
+        else:
+            buffers.append(self.buffer(frame.index.to_series()))
+
+        self.entries = []
+        size = 0
+        for kind, dtype, array in buffers:
+            self.entries.append((kind, dtype, size, len(array)))
+            size += -(-array.nbytes // SharedFrame.alignment) * SharedFrame.alignment
+
+        shm = SharedMemory(create=True, size=max(size, 1))
+        for (kind, dtype, offset, length), (_, _, array) in zip(self.entries, buffers):
+            np.ndarray(length, array.dtype, buffer=shm.buf, offset=offset)[:] = array
+        self.name = shm.name
+        self.size = size
+        shm.close()
@@ -0,0 +1,50 @@
+from time import perf_counter
+import sys
+
+import numpy as np
+
+import tt_globals.globals as fc_globals
+from tt_jobs.jobs import ElapsedTimeFrame
+
+
+# velocities at both ends of a segment every timestep, two tides a day with a little noise, rounded like a velocity frame
+def tidal_velocities(rng, num_steps: int, amplitude: float):
+    hours = np.arange(num_steps) * fc_globals.TIMESTEP / 3600
+    start = amplitude * np.sin(2 * np.pi * hours / 12.42) + rng.normal(0, 0.05, num_steps)
+    end = amplitude * np.sin(2 * np.pi * (hours - 0.5) / 12.42) + rng.normal(0, 0.05, num_steps)
+    return np.round(start, 2), np.round(end, 2)
+
+
+# the original, one python loop per departure
+def loop_elapsed_times(distances, length):
+    timestep_and_error = [ElapsedTimeFrame.elapsed_time(distances[i:], length) for i in range(len(distances))]
+    return [t[0] for t in timestep_and_error], [round(t[1], 4) for t in timestep_and_error]
+
+
+def elapsed_time(function, distances, length):
+    init_time = perf_counter()
+    result = function(distances, length)
+    return perf_counter() - init_time, result
+
+
+if __name__ == '__main__':
+    # python benchmark.py [number of departures] [segment length in nm]
+    args = sys.argv[1:]
+    num_steps = int(args[0]) if len(args) > 0 else 20000
+    length = float(args[1]) if len(args) > 1 else 5.0
+    rng = np.random.default_rng(0)
+    start_velocities, end_velocities = tidal_velocities(rng, num_steps + 1, 3.0)
+
+    print(f'{num_steps} departures over {length} nm, currents up to 3 kts')
+    for speed in [9, 5, 3, -3, -5]:  # at 3 knots and below the current sets the boat back
+        dist = ElapsedTimeFrame.distance(end_velocities[1:], start_velocities[:-1], speed, fc_globals.TIMESTEP / 3600) * np.sign(speed)
+        loop_time, loop_result = elapsed_time(loop_elapsed_times, dist, length)
+        vectorized_time, vectorized_result = elapsed_time(ElapsedTimeFrame.elapsed_times, dist, length)
+        print(f'{speed:>5} kts: loop {loop_time:8.2f} s, vectorized {vectorized_time:6.3f} s, {loop_time / vectorized_time:7.0f}x, '
+              f'identical {loop_result == tuple(result.tolist() for result in vectorized_result)}', flush=True)
+
+    departures = 16 * 31 * 24 * 3600 // fc_globals.TIMESTEP
+    start_velocities, end_velocities = tidal_velocities(rng, departures + 1, 3.0)
+    dist = ElapsedTimeFrame.distance(end_velocities[1:], start_velocities[:-1], 3, fc_globals.TIMESTEP / 3600)
+    vectorized_time, _ = elapsed_time(ElapsedTimeFrame.elapsed_times, dist, length)
+    print(f'\n{departures} departures at 3 kts: {vectorized_time:.2f} s vectorized')
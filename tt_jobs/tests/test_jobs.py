@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tt_dataframe.dataframe import DataFrame
+from tt_gpx.gpx import Waypoint
+from tt_interpolation.interpolation import SplineCoefficients
+from tt_jobs.jobs import velocity_frame, ElapsedTimeFrame
+
+STAMPS = 1698796800 + 60 * np.arange(24 * 60)  # a day at one minute steps
+
+
+def velocities(hours_late: float):
+    return np.round(2 * np.sin(2 * np.pi * (STAMPS / 3600 - hours_late) / 12.42), 2)
+
+
+# a segment from a subordinate station, kept as its spline, to a harmonic station, kept as its velocity frame
+def mixed_segment(folder: Path):
+    start_path = folder.joinpath('S')
+    end_path = folder.joinpath('H')
+    start_path.mkdir()
+    end_path.mkdir()
+    grid = (int(STAMPS[0]), int(STAMPS[-1]) + 60, 60)
+    start_path = SplineCoefficients.fit(pd.Series(STAMPS), pd.Series(velocities(0)), grid).write(start_path.joinpath(Waypoint.velocity_spline_name))
+    frame = DataFrame(data={'stamp': STAMPS, 'Velocity_Major': velocities(0.5)})
+    frame['Time'] = pd.to_datetime(frame.stamp, unit='s', utc=True)
+    end_path = frame.write(end_path.joinpath(Waypoint.velocity_csv_name))
+    return start_path, end_path
+
+
+def test_spline_and_csv_velocity_frames_have_the_same_times(tmp_path):
+    start_path, end_path = mixed_segment(tmp_path)
+    sf, ef = velocity_frame(start_path), velocity_frame(end_path)
+    assert sf.Time.dtype == ef.Time.dtype
+    assert sf.stamp.equals(ef.stamp)
+    assert sf.Time.equals(ef.Time)
+
+
+def test_mixed_segment_elapsed_times(tmp_path):
+    start_path, end_path = mixed_segment(tmp_path)
+    frame = ElapsedTimeFrame.speeds_frame(start_path, end_path, 1.0, [5, -5], 'seg')
+    assert len(frame) == len(STAMPS) - 1
+    assert frame.Time.iloc[0] == pd.Timestamp(int(STAMPS[0]), unit='s', tz='UTC')
+    for speed in [5, -5]:  # a mile at five knots is about twelve minutes, give or take the current
+        assert 6 < frame[f'{speed} seg timesteps'].iloc[0] < 24
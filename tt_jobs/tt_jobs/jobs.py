@@ -4,7 +4,6 @@ from pathlib import Path
 from datetime import date, datetime
 
 from scipy.signal import savgol_filter
-from sympy import Point
 from zoneinfo import ZoneInfo
 
 from tt_dataframe.dataframe import DataFrame
@@ -13,17 +12,39 @@ from tt_job_manager.job_manager import Job
 import tt_globals.globals as fc_globals
 from tt_date_time_tools.date_time_tools import hours_mins
 from tt_geometry.geometry import Arc, StartArc, EndArc
-from tt_interpolation.interpolation import Interpolator as VInt, CubicSplineFrame
+from tt_interpolation.interpolation import Interpolator as VInt, InterpolationOperator, SplineCoefficients
 from tt_noaa_data.noaa_data import SixteenMonths
 
+# downstream jobs take either a frame or the upstream job(s) that will produce it
+def upstream_jobs(frame) -> list:
+    if isinstance(frame, Job):
+        return [frame]
+    if isinstance(frame, (list, tuple)) and len(frame) and all(isinstance(f, Job) for f in frame):
+        return list(frame)
+    return []
+
+# a waypoint's velocities are its spline if it is a subordinate station, otherwise its velocity frame
+def velocity_path(waypoint) -> Path | None:
+    for path in [waypoint.folder.joinpath(Waypoint.velocity_spline_name), waypoint.folder.joinpath(Waypoint.velocity_csv_name)]:
+        if path.exists():
+            return path
+    return None
+
+# the dense frame of a waypoint's velocities, a spline is evaluated here rather than read from disk
+def velocity_frame(path: Path) -> DataFrame:
+    if path.name == Waypoint.velocity_spline_name:
+        frame = SplineFrame.evaluate(SplineCoefficients.read(path))
+    else:
+        frame = DataFrame(csv_source=path)
+    frame['Time'] = pd.to_datetime(frame.Time, utc=True).astype('datetime64[ns, UTC]')  # one unit, pandas gives seconds for stamps and microseconds for strings
+    return frame
+
 class InterpolatedPoint:
 
     def __init__(self, interpolation_pt_data, lats, lons, vels):
-        num_points = range(len(vels))
-        surface_points = tuple([Point(lats[i], lons[i], vels[i]) for i in num_points])
-        interpolator = VInt(surface_points)
-        interpolator.set_interpolation_point(Point(interpolation_pt_data[1], interpolation_pt_data[2], 0))
-        interpolated_velocity = np.round(float(interpolator.get_interpolated_point().z.evalf()), 2)
+        interpolator = VInt(np.column_stack([lats, lons, vels]))
+        interpolator.set_interpolation_point([interpolation_pt_data[1], interpolation_pt_data[2], 0])
+        interpolated_velocity = np.round(float(interpolator.get_interpolated_point()[2]), 2)
         self.velocity = interpolated_velocity
 
 class InterpolatePointJob(Job):
@@ -37,25 +58,70 @@ class InterpolatePointJob(Job):
         arguments = [interpolated_pt_data, lats, lons, velos]
         super().__init__(str(index) + ' ' + str(timestamp), timestamp, InterpolatedPoint, arguments, {})
 
-class SplineFrame(DataFrame):
+class InterpolationFrame(DataFrame):
+    # a location's velocities at every step its stations have in common, interpolated from their velocity frames in one pass
+    # stamps before start or from end on are left out when given, laid out like a velocity frame so elapsed time jobs read it as one
+    # the operator spaces edge points without the velocities, so on some station sets it is knots from an InterpolatedPoint
+
+    def __init__(self, location: Waypoint, stations: list, start: int = None, end: int = None):
+        paths = [velocity_path(station) for station in stations]
+        if None in paths:
+            raise FileNotFoundError(f'no velocities for {stations[paths.index(None)].name}')
+        velocities = pd.concat([velocity_frame(path).set_index('stamp').Velocity_Major for path in paths], axis=1, join='inner')
+        if start is not None:
+            velocities = velocities[velocities.index >= start]
+        if end is not None:
+            velocities = velocities[velocities.index < end]
+        operator = InterpolationOperator.cached(np.array([[station.lat, station.lon] for station in stations]), np.array([location.lat, location.lon]))
+        frame = DataFrame(data={'stamp': velocities.index.to_numpy(), 'Velocity_Major': np.round(operator.apply(velocities.to_numpy()), 2)})
+        frame['Time'] = pd.to_datetime(frame.stamp, unit='s', utc=True)
+        super().__init__(data=frame)
+
+class InterpolationJob(Job):  # super -> job name, result key, function/object, arguments
+    # the whole series of a location in one job, where an InterpolatePointJob is one location at one timestamp
 
-    def __init__(self, year: int, waypoint: Waypoint):
+    def execute(self): return super().execute()
+    def execute_callback(self, result, message: str = None):
+        result.write(self.filepath)
+        return super().execute_callback(result)
+    def error_callback(self, result): return super().error_callback(result)
+
+    def __init__(self, location: Waypoint, stations: list, start: int = None, end: int = None):
+        self.filepath = location.velocity_csv_path
+        result_key = location.id
+        arguments = tuple([location, stations, start, end])
+        super().__init__(location.id + ' ' + location.name, result_key, InterpolationFrame, arguments, {})
 
+class VelocitySpline(SplineCoefficients):
+    # the cubic spline through a subordinate station's raw velocities, its grid is the run's sixteen months at one minute steps
+
+    def __init__(self, year: int, waypoint: Waypoint):
         input_frame = DataFrame(csv_source=waypoint.raw_csv_path)
+        stamp_step = 60  # timestamps in seconds so steps of one minute is 60
+        start_stamp = int(datetime(year=year - 1, month=11, day=1, tzinfo=ZoneInfo("GMT")).timestamp())
+        end_stamp = int(datetime(year=year + 1, month=3, day=1, tzinfo=ZoneInfo("GMT")).timestamp())
+        spline = SplineCoefficients.fit(input_frame.stamp, input_frame.Velocity_Major, (start_stamp, end_stamp, stamp_step))
+        super().__init__(spline.spline.x, spline.spline.c, spline.grid)
+
+class SplineFrame(DataFrame):
+
+    # a subordinate station's velocities at every step of its spline's grid
+    @staticmethod
+    def evaluate(spline: SplineCoefficients) -> DataFrame:
+        cs_frame = spline.frame('stamp', 'Velocity_Major')
+        cs_frame['Time'] = pd.to_datetime(cs_frame.stamp, unit='s', utc=True)
+        cs_frame['Velocity_Major'] = cs_frame.Velocity_Major.round(2)
+        return cs_frame
+
+    def __init__(self, year: int, waypoint: Waypoint):
 
         if waypoint.type == 'S':
-            stamp_step = 60  # timestamps in seconds so steps of one minute is 60
-            start_stamp = int(datetime(year=year - 1, month=11, day=1, tzinfo=ZoneInfo("GMT")).timestamp())
-            end_stamp = int(datetime(year=year + 1, month=3, day=1, tzinfo=ZoneInfo("GMT")).timestamp())
-            stamps = [start_stamp + i * stamp_step for i in range(int((end_stamp - start_stamp)/stamp_step))]
-            cs_frame = CubicSplineFrame(input_frame.stamp, input_frame.Velocity_Major, stamps)
-            cs_frame['Time'] = pd.to_datetime(cs_frame.stamp, unit='s', utc=True)
-            cs_frame['Velocity_Major'] = cs_frame.Velocity_Major.round(2)
-            super().__init__(data=cs_frame)
+            super().__init__(data=SplineFrame.evaluate(VelocitySpline(year, waypoint)))
         else:
-            super().__init__(data=input_frame)
+            super().__init__(data=DataFrame(csv_source=waypoint.raw_csv_path))
 
 class SplineJob(Job):  # super -> job name, result key, function/object, arguments
+    # subordinate stations write their spline, dense frames are evaluated from it by the jobs that read them
 
     def execute(self): return super().execute()
     def execute_callback(self, result, message:str = None):
@@ -64,10 +130,10 @@ class SplineJob(Job):  # super -> job name, result key, function/object, argumen
     def error_callback(self, result): return super().error_callback(result)
 
     def __init__(self, year: int, waypoint: Waypoint):
-        self.filepath = waypoint.velocity_csv_name
+        self.filepath = waypoint.velocity_spline_path if waypoint.type == 'S' else waypoint.velocity_csv_path
         result_key = waypoint.id
         arguments = tuple([year, waypoint])
-        super().__init__(waypoint.id + ' ' + waypoint.name, result_key, SplineFrame, arguments, {})
+        super().__init__(waypoint.id + ' ' + waypoint.name, result_key, VelocitySpline if waypoint.type == 'S' else SplineFrame, arguments, {})
 
 class RequestVelocityFrame(SixteenMonths):
 
@@ -76,6 +142,10 @@ class RequestVelocityFrame(SixteenMonths):
         super().__init__(year, waypoint)
 
 class RequestVelocityJob(Job):  # super -> job name, result key, function/object, arguments
+
+    io_bound = True  # NOAA requests wait on the network
+    timeout = 900  # sixteen months of requests, retries included, a request that never returns fails the job
+
     def execute(self): return super().execute()
     def execute_callback(self, result, message:str = None):
         result.write(self.filepath)
@@ -114,75 +184,175 @@ class ElapsedTimeFrame(DataFrame):
         else:
             return [index - 1, cum_sum - length]
 
+    # first index from each start at which values reach its target, len(values) if none does
+    # doubling from the start over block maxima until a block reaches it, then halving back to the index
+    @staticmethod
+    def first_reaching(values, starts, targets):
+        values = np.append(values, np.inf)
+        maxima = [values]  # maxima[level][p] is the largest of values[p:p + 2**level]
+        positions = starts.copy()
+        doubling = np.ones(len(starts), dtype=bool)
+        while doubling.any():
+            size, block = 1 << len(maxima) - 1, maxima[-1]
+            doubling &= (positions + size <= len(values)) & (block[np.minimum(positions, len(block) - 1)] < targets)
+            positions[doubling] += size
+            if doubling.any():
+                maxima.append(np.maximum(block[:-size], block[size:]))
+        for level in reversed(range(len(maxima))):
+            size, block = 1 << level, maxima[level]
+            below = (positions + size <= len(values)) & (block[np.minimum(positions, len(block) - 1)] < targets)
+            positions[below] += size
+        return positions
+
+    # the timestep each departure's cumulative distance first reaches its target, the last timestep if it never does
+    # searchsorted on the running maximum, unless an opposing current has set the departure back behind that maximum
+    @staticmethod
+    def arrivals(cumulative, highest, targets):
+        departures = np.arange(len(targets))
+        arrivals = np.searchsorted(highest, targets)
+        behind = highest[:-1] >= targets
+        arrivals[behind] = ElapsedTimeFrame.first_reaching(cumulative, departures[behind], targets[behind])
+        return np.minimum(arrivals, len(targets))
+
+    # elapsed_time for some departures at once, a step at a time, adding the distances in the same order so the sums round alike
+    @staticmethod
+    def replayed_elapsed_times(distances, length, departures):
+        timesteps, errors = np.empty(len(departures), dtype=int), np.empty(len(departures))
+        positions, sums, step = np.arange(len(departures)), np.zeros(len(departures)), 0
+        while len(positions):
+            done = (sums >= length) | (departures[positions] + step >= len(distances))
+            timesteps[positions[done]], errors[positions[done]] = step - 1, sums[done] - length
+            positions, sums = positions[~done], sums[~done]
+            sums += distances[departures[positions] + step]
+            step += 1
+        return timesteps, errors
+
+    # elapsed_time for a departure at every timestep at once, arrays of timesteps and errors rounded to places
+    # distances between timesteps come from one cumulative sum, off from elapsed_time's by far less than tolerance,
+    # departures whose arrival or rounded error could differ by that much are replayed as elapsed_time adds them
+    @staticmethod
+    def elapsed_times(distances, length, places: int = 4, tolerance=1e-6):
+        cumulative = np.concatenate([[0.0], np.cumsum(distances)])
+        highest = np.maximum.accumulate(cumulative)
+        early = ElapsedTimeFrame.arrivals(cumulative, highest, cumulative[:-1] + length - tolerance)
+        arrivals = ElapsedTimeFrame.arrivals(cumulative, highest, cumulative[:-1] + length + tolerance)
+        timesteps = arrivals - np.arange(len(distances)) - 1
+        errors = cumulative[arrivals] - cumulative[:-1] - length
+        tied = np.abs(np.abs(errors * 10**places) % 1 - 0.5) < tolerance * 10**places
+        doubtful = np.flatnonzero((early != arrivals) | tied)
+        timesteps[doubtful], errors[doubtful] = ElapsedTimeFrame.replayed_elapsed_times(distances, length, doubtful)
+        return timesteps, np.round(errors, places)  # rounded as round rounds the np.float64 elapsed_time gives
+
     @classmethod
     def frame(cls, start_path: Path, end_path: Path, length: float, speed: int, name: str):
+        return ElapsedTimeFrame.speed_frame(ElapsedTimeFrame.speeds_frame(start_path, end_path, length, [speed], name), speed)
+
+    # the elapsed times of every speed from one read of the segment's velocities, columns prefixed by speed
+    # distances and fair current flags are (speed x departure) arrays, the average velocity is the same for every speed
+    @classmethod
+    def speeds_frame(cls, start_path: Path, end_path: Path, length: float, speeds: list, name: str):
 
         if not start_path.exists() or not end_path.exists():
             raise FileExistsError
 
-        sf = DataFrame(csv_source=start_path)
-        ef = DataFrame(csv_source=end_path)
+        sf = velocity_frame(start_path)
+        ef = velocity_frame(end_path)
 
         if not len(sf) == len(ef) or not sf.stamp.equals(ef.stamp) or not sf.Time.equals(ef.Time):
             raise ValueError
 
-        dist = ElapsedTimeFrame.distance(ef.Velocity_Major.to_numpy()[1:], sf.Velocity_Major.to_numpy()[:-1], speed, fc_globals.TIMESTEP / 3600)
-        dist = dist * np.sign(speed)  # if the sign(dist) == sign(speed), dist+, else dist-
+        speed_column = np.array(speeds)[:, np.newaxis]
+        dist = ElapsedTimeFrame.distance(ef.Velocity_Major.to_numpy()[1:], sf.Velocity_Major.to_numpy()[:-1], speed_column, fc_globals.TIMESTEP / 3600)
+        dist = dist * np.sign(speed_column)  # if the sign(dist) == sign(speed), dist+, else dist-
         av = ElapsedTimeFrame.average_velocity(ef.Velocity_Major.to_numpy()[1:], sf.Velocity_Major.to_numpy()[:-1])
-        fair_current_flag = (av * speed) > 0  # no opposing current flag, all average current directions match speed direction
-        fair_current_flag = fair_current_flag.tolist()
-        timestep_and_error = [ElapsedTimeFrame.elapsed_time(dist[i:], length) for i in range(len(dist))]
+        fair_current_flags = (av * speed_column) > 0  # no opposing current flag, all average current directions match speed direction
 
         frame = DataFrame(data={'stamp': sf.stamp[:-1], 'Time': pd.to_datetime(sf.Time[:-1], utc=True)})
         frame['date'] = frame['Time'].dt.date
-        frame[name + ' timesteps'] = [t[0] for t in timestep_and_error]
-        frame[name + ' error'] = [round(t[1], 4) for t in timestep_and_error]
-        frame[name + ' faircurrent'] = fair_current_flag
+        columns = {}
+        for speed, speed_dist, fair_current_flag in zip(speeds, dist, fair_current_flags):
+            timesteps, errors = ElapsedTimeFrame.elapsed_times(speed_dist, length)
+            columns |= {f'{speed} {name} timesteps': timesteps, f'{speed} {name} error': errors, f'{speed} {name} faircurrent': fair_current_flag}
 
-        return frame
+        return DataFrame(pd.concat([frame, DataFrame(columns, index=frame.index)], axis=1))
+
+    # one speed's elapsed time frame out of a speeds frame
+    @staticmethod
+    def speed_frame(frame: DataFrame, speed: int):
+        prefix = f'{speed} '
+        columns = {c: c[len(prefix):] for c in frame.columns if c.startswith(prefix)}
+        return DataFrame(frame[['stamp', 'Time', 'date'] + list(columns)].rename(columns=columns))
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
 class ElapsedTimeJob(Job):  # super -> job name, result key, function/object, arguments
 
+    cache_version = f'1 timestep {fc_globals.TIMESTEP}'
+
     def execute(self): return super().execute()
     def execute_callback(self, result, message: str = None):
         message = f'#utc dates: {result.date.nunique()}'
         return super().execute_callback(result, message)
     def error_callback(self, result): return super().error_callback(result)
 
+    # the velocities of a segment are those of the nearest waypoints inward from its ends that have them
+    @staticmethod
+    def velocity_paths(seg: Segment):
+
+        node = seg.start
+        while (start_path := velocity_path(node)) is None:
+            node = node.next_edge.end
+
+        node = seg.end
+        while (end_path := velocity_path(node)) is None:
+            node = node.prev_edge.start
+
+        return start_path, end_path
+
     def __init__(self, seg: Segment, speed: int):
 
-        filepath = Route.filepath(ElapsedTimeFrame, speed)
         job_name = f'{speed} {seg.name}'
         result_key = seg.name
 
-        if filepath.exists():
-            super().__init__(job_name, result_key, ElapsedTimeFrame, [], {'csv_source': filepath})
-        else:
-            node = seg.start
-            node_path = node.folder.joinpath(Waypoint.velocity_csv_name)
-            while not node_path.exists():
-                node = node.next_edge.end
-                node_path = node.folder.joinpath(Waypoint.velocity_csv_name)
-            start_path = node_path
-
-            node = seg.end
-            node_path = node.folder.joinpath(Waypoint.velocity_csv_name)
-            while not node_path.exists():
-                node = node.prev_edge.start
-                node_path = node.folder.joinpath(Waypoint.velocity_csv_name)
-            end_path = node_path
-    
-            arguments = [start_path, end_path, seg.length, speed, seg.name]
-            super().__init__(job_name, result_key, ElapsedTimeFrame.frame, arguments, {})
+        arguments = [*ElapsedTimeJob.velocity_paths(seg), seg.length, speed, seg.name]
+        super().__init__(job_name, result_key, ElapsedTimeFrame.frame, arguments, {})
+
+class ElapsedTimeSpeedsJob(Job):  # super -> job name, result key, function/object, arguments
+    # every speed of a segment in one job, velocities are read once instead of once per speed
+    # TimeStepsJob takes these in place of ElapsedTimeJobs and picks out its speed
+
+    cache_version = ElapsedTimeJob.cache_version
+
+    def execute(self): return super().execute()
+    def execute_callback(self, result, message: str = None):
+        message = f'#utc dates: {result.date.nunique()}, #speeds: {len(self.speeds)}'
+        return super().execute_callback(result, message)
+    def error_callback(self, result): return super().error_callback(result)
+
+    def __init__(self, seg: Segment, speeds: list = None):
+
+        self.speeds = list(fc_globals.SPEEDS if speeds is None else speeds)
+        job_name = f'speeds {seg.name}'
+        result_key = seg.name
+
+        arguments = [*ElapsedTimeJob.velocity_paths(seg), seg.length, self.speeds, seg.name]
+        super().__init__(job_name, result_key, ElapsedTimeFrame.speeds_frame, arguments, {})
 
 # noinspection PyTypeChecker
 class TimeStepsFrame(DataFrame):
 
+    # a column's values at rows as the scalars .at reads them
+    @staticmethod
+    def gather(column: pd.Series, rows):
+        return list(column.to_numpy()[rows] if isinstance(column.dtype, np.dtype) else column.array[rows])
+
     @classmethod
-    def frame(cls, et_frame: DataFrame) -> DataFrame:
+    def frame(cls, *et_frames: DataFrame) -> DataFrame:
+
+        et_frame = et_frames[0]
+        if len(et_frames) > 1:  # elapsed time frames of individual segments, from upstream jobs
+            et_frame = DataFrame(pd.concat([et_frame] + [f.drop(['stamp', 'Time', 'date'], axis=1) for f in et_frames[1:]], axis=1))
 
         frame = DataFrame()
         frame['stamp'] = et_frame['stamp']
@@ -199,19 +369,20 @@ class TimeStepsFrame(DataFrame):
         for c in seg_cols:
             frame[c] = pd.NA
 
-        for stamp_index in range(len(frame)):
-            row_index = stamp_index
-            for ts_col, err_col, fc_col in triple_column:
-                if pd.isna(row_index) or row_index < 0 or row_index >= len(et_frame):
-                    ts = err = fc = pd.NA
-                else:
-                    ts = et_frame.at[int(row_index), ts_col]
-                    err = et_frame.at[int(row_index), err_col]
-                    fc = et_frame.at[int(row_index), fc_col]
-                frame.at[stamp_index, ts_col] = ts
-                frame.at[stamp_index, err_col] = err
-                frame.at[stamp_index, fc_col] = fc
-                row_index += int(ts) if pd.notna(ts) else pd.NA
+        # every departure at once, its row in a segment's columns is its row in the previous segment's plus that segment's timesteps
+        # a row outside the frame is NA for that segment and every later one
+        rows, valid = np.arange(len(frame)), np.ones(len(frame), dtype=bool)
+        for ts_col, err_col, fc_col in triple_column:
+            valid &= (rows >= 0) & (rows < len(et_frame))
+            departures = np.flatnonzero(valid)
+            for c in [ts_col, err_col, fc_col]:
+                column = np.full(len(frame), pd.NA, dtype=object)
+                column[departures] = TimeStepsFrame.gather(et_frame[c], rows[departures])
+                frame[c] = column
+            ts = frame[ts_col].to_numpy()[departures]
+            known = pd.notna(ts)
+            valid[departures[~known]] = False
+            rows[departures[known]] += np.asarray(ts[known], dtype=int)
 
         frame['t_time'] = frame[timestep_cols].sum(axis=1)
         frame['error'] = frame[error_cols].sum(axis=1)
@@ -219,10 +390,15 @@ class TimeStepsFrame(DataFrame):
 
         return frame
 
+    @classmethod
+    def speeds_frame(cls, *et_frames: DataFrame, speed: int) -> DataFrame:
+        return TimeStepsFrame.frame(*[ElapsedTimeFrame.speed_frame(et_frame, speed) for et_frame in et_frames])
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
 class TimeStepsJob(Job):
+    # not cached, its frames are the largest of a run and chaining them again is a few gathers
 
     def execute(self): return super().execute()
     def execute_callback(self, result, message: str = None):
@@ -231,13 +407,16 @@ class TimeStepsJob(Job):
         return super().execute_callback(result, message)
     def error_callback(self, result): return super().error_callback(result)
 
-    def __init__(self, frame: DataFrame, speed: int):
+    def __init__(self, frame: DataFrame | Job | list, speed: int):
         self.filepath = Route.filepath(TimeStepsFrame, speed)
         job_name = f'{TimeStepsFrame.__name__} {speed}'
         result_key = speed
 
-        if self.filepath.exists():
-            super().__init__(job_name, result_key, ElapsedTimeFrame, [], {'csv_source': self.filepath})
+        if upstream := upstream_jobs(frame):
+            if all(isinstance(job, ElapsedTimeSpeedsJob) for job in upstream):  # frames of every speed, this job's is picked out
+                super().__init__(job_name, result_key, TimeStepsFrame.speeds_frame, [], {'speed': speed}, upstream)
+            else:
+                super().__init__(job_name, result_key, TimeStepsFrame.frame, [], {}, upstream)
         else:
             super().__init__(job_name, result_key, TimeStepsFrame.frame, [frame], {})
 
@@ -263,6 +442,8 @@ class SavGolFrame(DataFrame):
 
 class SavGolJob(Job):
 
+    cache_version = f'1 savgol {SavGolFrame.savgol_size} {SavGolFrame.savgol_order}'
+
     def execute(self): return super().execute()
     def execute_callback(self, result, message:str = None):
         result.write(self.filepath)
@@ -270,13 +451,13 @@ class SavGolJob(Job):
         return super().execute_callback(result, message)
     def error_callback(self, result): return super().error_callback(result)
 
-    def __init__(self, frame: DataFrame, speed: int):
+    def __init__(self, frame: DataFrame | Job, speed: int):
         self.filepath = Route.filepath(SavGolFrame, speed)
         job_name = f'{SavGolFrame.__name__} {speed}'
         result_key = speed
 
-        if self.filepath.exists():
-            super().__init__(job_name, result_key, SavGolFrame, [], {'csv_source': self.filepath})
+        if upstream := upstream_jobs(frame):
+            super().__init__(job_name, result_key, SavGolFrame.frame, [], {}, upstream)
         else:
             super().__init__(job_name, result_key, SavGolFrame.frame, [frame], {})
 
@@ -294,6 +475,8 @@ class FairCurrentFrame(DataFrame):
 
 class FairCurrentJob(Job):
 
+    cache_version = '1'
+
     def execute(self): return super().execute()
     def execute_callback(self, result, message: str = None):
         result.write(self.filepath)
@@ -301,13 +484,13 @@ class FairCurrentJob(Job):
         return super().execute_callback(result, message)
     def error_callback(self, result): return super().error_callback(result)
 
-    def __init__(self, frame: DataFrame, speed: int):
+    def __init__(self, frame: DataFrame | Job, speed: int):
         self.filepath = Route.filepath(FairCurrentFrame, speed)
         job_name = f'{FairCurrentFrame.__name__} {speed}'
         result_key = speed
 
-        if self.filepath.exists():
-            super().__init__(job_name, result_key, FairCurrentFrame, [], {'csv_source': self.filepath})
+        if upstream := upstream_jobs(frame):
+            super().__init__(job_name, result_key, FairCurrentFrame.frame, [], {}, upstream)
         else:
             super().__init__(job_name, result_key, FairCurrentFrame.frame, [frame], {})
 
@@ -353,6 +536,8 @@ class SavGolMinimaFrame(DataFrame):
 
 class SavGolMinimaJob(Job):  # super -> job name, result key, function/object, arguments
 
+    cache_version = f'1 noise {SavGolMinimaFrame.noise_threshold} timestep {fc_globals.TIMESTEP}'
+
     def execute(self): return super().execute()
     def execute_callback(self, result, message: str = None):
         result.write(self.filepath)
@@ -360,13 +545,13 @@ class SavGolMinimaJob(Job):  # super -> job name, result key, function/object, a
         return super().execute_callback(result, message)
     def error_callback(self, result): return super().error_callback(result)
 
-    def __init__(self, frame: DataFrame, speed: int):
+    def __init__(self, frame: DataFrame | Job, speed: int):
         self.filepath = Route.filepath(SavGolMinimaFrame, speed)
         job_name = f'{SavGolMinimaFrame.__name__} {speed}'
         result_key = speed
 
-        if self.filepath.exists():
-            super().__init__(job_name, result_key, SavGolMinimaFrame, [], {'csv_source': self.filepath})
+        if upstream := upstream_jobs(frame):
+            super().__init__(job_name, result_key, SavGolMinimaFrame.frame, [], {}, upstream)
         else:
             super().__init__(job_name, result_key, SavGolMinimaFrame.frame, [frame], {})
 
@@ -410,6 +595,8 @@ class FairCurrentMinimaFrame(DataFrame):
 
 class FairCurrentMinimaJob(Job):  # super -> job name, result key, function/object, arguments
 
+    cache_version = f'1 noise {FairCurrentMinimaFrame.noise_threshold} timestep {fc_globals.TIMESTEP}'
+
     def execute(self): return super().execute()
     def execute_callback(self, result, message: str = None):
         result.write(self.filepath)
@@ -417,13 +604,13 @@ class FairCurrentMinimaJob(Job):  # super -> job name, result key, function/obje
         return super().execute_callback(result, message)
     def error_callback(self, result): return super().error_callback(result)
 
-    def __init__(self, frame: DataFrame, speed: int):
+    def __init__(self, frame: DataFrame | Job, speed: int):
             self.filepath = Route.filepath(FairCurrentMinimaFrame, speed)
             job_name = f'{FairCurrentMinimaFrame.__name__} {speed}'
             result_key = speed
 
-            if self.filepath.exists():
-                super().__init__(job_name, result_key, FairCurrentMinimaFrame, [], {'csv_source': self.filepath})
+            if upstream := upstream_jobs(frame):
+                super().__init__(job_name, result_key, FairCurrentMinimaFrame.frame, [], {}, upstream)
             else:
                 super().__init__(job_name, result_key, FairCurrentMinimaFrame.frame, [frame], {})
 
@@ -465,6 +652,18 @@ class ArcsFrame(DataFrame):
 
         return frame
 
+    @staticmethod
+    def days(min_frame: DataFrame):
+        year = pd.to_datetime(min_frame.loc[0]['start_datetime']).year
+        first_day_string = str(fc_globals.TEMPLATES['first_day'].substitute({'year': year}))
+        last_day_string = str(fc_globals.TEMPLATES['last_day'].substitute({'year': year + 2}))
+        return pd.to_datetime(first_day_string).date(), pd.to_datetime(last_day_string).date()
+
+    @classmethod
+    def minima_frame(cls, *min_frames: DataFrame, speed: int):
+        min_frame = DataFrame(pd.concat(min_frames, ignore_index=True))
+        return ArcsFrame.frame(min_frame, speed, *ArcsFrame.days(min_frame))
+
     @classmethod
     def frame(cls, min_frame: DataFrame, speed: int, first_day: date, last_day: date):
 
@@ -516,6 +715,8 @@ class ArcsFrame(DataFrame):
         
 class ArcsJob(Job):  # super -> job name, result key, function/object, arguments
 
+    cache_version = '1'
+
     def execute(self): return super().execute()
     def execute_callback(self, result, message: str = None):
         result.write(self.filepath)
@@ -523,19 +724,13 @@ class ArcsJob(Job):  # super -> job name, result key, function/object, arguments
         return super().execute_callback(result, message)
     def error_callback(self, result): return super().error_callback(result)
 
-    def __init__(self, frame: DataFrame, speed: int):
+    def __init__(self, frame: DataFrame | Job | list, speed: int):
             self.filepath = Route.filepath(ArcsFrame, speed)
             job_name = f'{ArcsFrame.__name__} {speed}'
             result_key = speed
 
-            year = pd.to_datetime(frame.loc[0]['start_datetime']).year
-            first_day_string = str(fc_globals.TEMPLATES['first_day'].substitute({'year': year}))
-            last_day_string = str(fc_globals.TEMPLATES['last_day'].substitute({'year': year + 2}))
-
-            first_day = pd.to_datetime(first_day_string).date()
-            last_day = pd.to_datetime(last_day_string).date()
-
-            if self.filepath.exists():
-                super().__init__(job_name, result_key, ArcsFrame, [], {'csv_source': self.filepath})
+            if upstream := upstream_jobs(frame):  # minima jobs, their frames are combined once they finish
+                super().__init__(job_name, result_key, ArcsFrame.minima_frame, [], {'speed': speed}, upstream)
             else:
+                first_day, last_day = ArcsFrame.days(frame)
                 super().__init__(job_name, result_key, ArcsFrame.frame, [frame, speed, first_day, last_day], {})
@@ -3,4 +3,5 @@ from setuptools import setup, find_packages
 setup(
     name='tt_math',
     packages=find_packages(include=['tt_math', 'tt_math.*']),
+    install_requires=['scipy', 'numpy', 'pandas']
 )
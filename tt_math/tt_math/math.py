@@ -1,16 +1,39 @@
 import numpy as np
-from scipy.differentiate import derivative
-from scipy.interpolate import CubicSpline
+import pandas as pd
+from scipy.interpolate import CubicSpline, PPoly
 
+SLACK = 'slack'  # the velocity crosses zero
+FLOOD = 'flood'  # greatest flood, the largest maximum between two slacks
+EBB = 'ebb'  # greatest ebb, the lowest minimum between two slacks
+EXTREMUM = 'extremum'  # any other turn, like a lull within a flood or the lesser of its two peaks
+INFLECTION = 'inflection'  # the velocity changes fastest
+EVENTS = [SLACK, FLOOD, EBB, EXTREMUM, INFLECTION]
 
-def cubic_inflection_points(x_values, y_values):
 
-    # define the function
-    cs = CubicSpline(x_values, y_values)
-    second_derivative = derivative(cs, x_values)
+# the roots of a piecewise polynomial within its breakpoints, solved per interval
+def real_roots(spline: PPoly):
+    roots = spline.roots(extrapolate=False)
+    return np.unique(roots[np.isfinite(roots)])  # a flat interval has nan roots, a root on a breakpoint is found by both its intervals
+
 
-    # Find the sign changes in the second derivative
-    inflection_indices = np.where(np.diff(np.sign(second_derivative)))[0]
-    inflection_points = x_values[inflection_indices]
+# slack water, greatest flood and ebb and inflections of a spline of velocities at their exact x, in x order
+# a few rows per tide where a dense frame has a row per step, y is the spline's value at each
+def spline_events(spline: PPoly, x_name: str = 'x', y_name: str = 'y') -> pd.DataFrame:
+    first, second = spline.derivative(), spline.derivative(2)
+    slack, turns, inflections = real_roots(spline), real_roots(first), real_roots(second)
+    turn_values, curvature = spline(turns), second(turns)
+    peaks = ((turn_values > 0) & (curvature < 0)) | ((turn_values < 0) & (curvature > 0))  # maxima of a flood, minima of an ebb
+    tides = np.searchsorted(slack, turns)  # turns between the same two slacks are of one flood or ebb
+    order = np.lexsort((-np.abs(turn_values), ~peaks, tides))  # per tide, its peaks strongest first
+    first = order[np.diff(tides[order], prepend=-1) != 0]
+    greatest = np.zeros(len(turns), dtype=bool)
+    greatest[first] = peaks[first]
+    turn_events = np.where(greatest, np.where(turn_values > 0, FLOOD, EBB), EXTREMUM)
+    x = np.concatenate([slack, turns, inflections])
+    events = np.concatenate([np.full(len(slack), SLACK), turn_events, np.full(len(inflections), INFLECTION)])
+    order = np.argsort(x, kind='stable')
+    return pd.DataFrame({x_name: x[order], 'event': pd.Categorical(events[order], categories=EVENTS), y_name: spline(x[order])})
 
-    return inflection_points
+
+def cubic_inflection_points(x_values, y_values):
+    return real_roots(CubicSpline(x_values, y_values).derivative(2))
@@ -1,12 +1,107 @@
 from pathlib import Path
-from os import remove
+from os import utime, getpid, kill, name as os_name
+from threading import Thread
+from time import time, monotonic, sleep
+import socket
 from tt_os_abstraction.os_abstraction import env
 
+HEARTBEAT = 1.0  # seconds between touches of a semaphore file by the process that turned it on
+STALE = 3 * HEARTBEAT  # age of a semaphore file whose owner is taken to have died
 
-def on(name): Path(env('temp')).joinpath(name).with_suffix('.tmp').touch()
 
+def semaphore_path(name): return Path(env('temp')).joinpath(name).with_suffix('.tmp')
 
-def off(name): remove(Path(env('temp')).joinpath(name).with_suffix('.tmp'))
 
+def waiters_folder(name): return Path(env('temp')).joinpath(name).with_suffix('.waiters')
 
-def is_on(name): return True if Path(env('temp')).joinpath(name).with_suffix('.tmp').exists() else False
+
+# the owner touches the file while it lives, so one left by an owner that died reads as off once it is stale
+def heartbeat(path: Path, stamp: str):
+    while True:
+        sleep(HEARTBEAT)
+        try:
+            if path.read_text() != stamp:  # turned on again since, that owner keeps it fresh
+                return
+            utime(path)
+        except FileNotFoundError:  # turned off
+            return
+
+
+# each process blocked in wait listens on a localhost udp port, named by a file in the semaphore's waiters folder
+def notify(name):
+    folder = waiters_folder(name)
+    if not folder.exists():
+        return
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+        for waiter in folder.iterdir():
+            try:
+                sender.sendto(b'', ('127.0.0.1', int(waiter.name)))
+            except (OSError, ValueError):
+                pass
+
+
+def on(name):
+    path, stamp = semaphore_path(name), f'{getpid()} {time()}'
+    path.write_text(stamp)
+    Thread(target=heartbeat, args=(path, stamp), daemon=True).start()
+    notify(name)
+
+
+def off(name):
+    semaphore_path(name).unlink(missing_ok=True)
+    notify(name)
+
+
+# whether the process that turned a semaphore on still runs, other processes are only checked where kill can probe them
+def alive(pid: int):
+    if pid == getpid():
+        return True
+    if os_name != 'posix':  # kill terminates the process on windows
+        return False
+    try:
+        kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # it runs, as another user
+        return True
+    try:  # a child that died keeps its pid until its parent reaps it
+        with open(f'/proc/{pid}/stat') as stat:
+            return stat.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except OSError:
+        return True
+
+
+# a stale file is still on while its owner runs, a heartbeat held up on a busy machine is not a dead owner
+def is_on(name):
+    path = semaphore_path(name)
+    try:
+        if time() - path.stat().st_mtime < STALE:
+            return True
+        return alive(int(path.read_text().split()[0]))
+    except (FileNotFoundError, ValueError, IndexError):  # off, or a file of the old format or still being written
+        return False
+
+
+# blocks until the semaphore is on, or off, or timeout seconds have passed, and returns whether it got there
+# on and off wake it at once, an owner that dies without turning it off is noticed within STALE seconds
+def wait(name, state=True, timeout=None):
+    deadline = None if timeout is None else monotonic() + timeout
+    folder = waiters_folder(name)
+    folder.mkdir(parents=True, exist_ok=True)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as listener:
+        listener.bind(('127.0.0.1', 0))
+        registration = folder.joinpath(str(listener.getsockname()[1]))
+        registration.touch()  # before the state is read, so a change after it is not missed
+        try:
+            while is_on(name) != state:
+                remaining = None if deadline is None else deadline - monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                listener.settimeout(remaining if state else min(HEARTBEAT, remaining or HEARTBEAT))
+                try:
+                    listener.recv(1)
+                except socket.timeout:
+                    pass
+            return True
+        finally:
+            registration.unlink(missing_ok=True)